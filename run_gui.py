@@ -11,8 +11,6 @@ import os
 # 添加 src 目录到 Python 路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from gui_main import main
-
 if __name__ == '__main__':
     print("=" * 60)
     print("智能 Shell 助手 - GUI 模式")
@@ -21,6 +19,8 @@ if __name__ == '__main__':
     print()
     
     try:
+        # 先输出提示再导入 GUI 模块，避免导入 PyQt6 期间界面无响应
+        from gui_main import main
         main()
     except ImportError as e:
         print(f"❌ 导入错误: {e}")
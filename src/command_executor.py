@@ -6,15 +6,203 @@
 """
 
 import subprocess
+import codecs
+import selectors
 import sys
 import platform
 import os
-from typing import Dict, Optional
+import json
+import time
+import shlex
+import shutil
+import hashlib
+import re
+from typing import Callable, Dict, Optional, Tuple
+
+from config import DEFAULT_CACHE_DIR, pop_cache_tokens
+
+
+# 输入中的缓存控制指令
+CACHE_SKIP_TOKEN = '!cache:skip'  # 本次不读写缓存
+CACHE_BUST_TOKEN = '!cache:bust'  # 清除缓存后重新执行
+
+# 含有这些字符的命令可能带有重定向、管道或多条命令，不做缓存
+_CACHE_UNSAFE_CHARS = frozenset(';&|<>`$\n')
+
+
+class _CommandCache:
+    """
+    命令结果磁盘缓存
+
+    以 (命令, 工作目录) 为键，每条缓存保存在独立目录中:
+        <cache_dir>/<key>/meta.json, stdout, stderr
+    """
+
+    def __init__(self, cache_dir: str, ttl: float):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _entry_dir(self, command: str) -> str:
+        key = hashlib.sha256((command + '\0' + os.getcwd()).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, command: str) -> Optional[Dict]:
+        """读取未过期的缓存结果，不存在或已过期返回 None"""
+        entry_dir = self._entry_dir(command)
+        try:
+            with open(os.path.join(entry_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if time.time() - meta['timestamp'] > meta['ttl']:
+                return None
+            with open(os.path.join(entry_dir, 'stdout'), 'r', encoding='utf-8') as f:
+                stdout = f.read()
+            with open(os.path.join(entry_dir, 'stderr'), 'r', encoding='utf-8') as f:
+                stderr = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return_code = meta['return_code']
+        return {
+            'status': 'success' if return_code == 0 else 'error',
+            'output': stdout,
+            'error': stderr,
+            'return_code': return_code,
+            'command': command
+        }
+
+    def put(self, command: str, result: Dict):
+        """写入缓存，先写临时文件再原子替换，meta.json 最后写入"""
+        entry_dir = self._entry_dir(command)
+        meta = {
+            'return_code': result['return_code'],
+            'timestamp': time.time(),
+            'ttl': self.ttl
+        }
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            for name, data in (('stdout', result['output']), ('stderr', result['error']), ('meta.json', json.dumps(meta))):
+                path = os.path.join(entry_dir, name)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+        except OSError:
+            # 缓存写入失败不影响命令执行结果
+            pass
+
+    def bust(self, command: Optional[str] = None):
+        """清除指定命令的缓存，command 为 None 时清空全部缓存"""
+        target = self.cache_dir if command is None else self._entry_dir(command)
+        shutil.rmtree(target, ignore_errors=True)
+
+
+def _compute_shell_type() -> str:
+    """根据操作系统和环境变量判断 Shell 类型"""
+    if _IS_WINDOWS:
+        # Windows上检查是否在PowerShell中
+        if os.environ.get('PSModulePath'):
+            return 'PowerShell'
+        else:
+            return 'cmd'
+    else:
+        # Unix-like系统
+        shell = os.environ.get('SHELL', '')
+        if 'bash' in shell:
+            return 'bash'
+        elif 'zsh' in shell:
+            return 'zsh'
+        elif 'fish' in shell:
+            return 'fish'
+        else:
+            return 'sh'
+
+
+# 危险命令片段（已转为小写）及对应警告，按优先级排列
+_DANGER_PATTERNS: tuple[tuple[str, str], ...] = (
+    ('rm -rf /', '删除根目录，极度危险！'),
+    ('rm -rf /*', '删除根目录下所有文件，极度危险！'),
+    ('mkfs', '格式化磁盘，会丢失所有数据！'),
+    ('dd if=', '直接操作设备，可能损坏系统！'),
+    (':(){ :|:& };:', 'Fork炸弹，会导致系统崩溃！'),
+    ('chmod -r 777', '修改所有文件权限，严重安全隐患！'),
+    ('chown -r', '修改文件所有者，可能导致权限问题！'),
+)
+
+# 含有这些字符的命令需要真正的 Shell 展开（变量、通配符、管道等），不走快速路径
+_FAST_PATH_UNSAFE_CHARS = frozenset('|&;<>()$`\\*?[]{}~!#\n')
+
+
+def _fast_pwd(args):
+    if args:
+        return None
+    try:
+        return 0, os.getcwd(), ''
+    except OSError as e:
+        # 当前目录已被删除等情况
+        return 1, '', f'pwd: {e.strerror}'
+
+
+def _fast_cd(args):
+    if len(args) > 1 or (args and args[0].startswith('-')):
+        return None
+    target = args[0] if args else os.path.expanduser('~')
+    try:
+        os.chdir(target)
+    except OSError as e:
+        return 1, '', f'cd: {target}: {e.strerror}'
+    return 0, '', ''
+
+
+def _fast_echo(args):
+    if args and args[0].startswith('-'):
+        return None
+    return 0, ' '.join(args), ''
+
+
+def _fast_whoami(args):
+    if args:
+        return None
+    import pwd
+    uid = os.geteuid()
+    try:
+        return 0, pwd.getpwuid(uid).pw_name, ''
+    except KeyError:
+        # 容器中常见：uid 在 /etc/passwd 中没有对应条目
+        return 1, '', f'whoami: cannot find name for user ID {uid}'
+
+
+# 可以在当前进程内直接完成的简单命令，省去创建子进程的开销（仅 Unix）
+# 处理函数返回 (退出码, 标准输出, 错误输出)，返回 None 表示交给 Shell 执行
+_FAST_PATH = {
+    'pwd': _fast_pwd,
+    'cd': _fast_cd,
+    'echo': _fast_echo,
+    'whoami': _fast_whoami,
+}
+
+# 操作系统和 Shell 在进程运行期间不会变化，导入时计算一次
+_PLATFORM = platform.system()
+_IS_WINDOWS = _PLATFORM == 'Windows'
+_SHELL_TYPE = _compute_shell_type()
+
+# Windows 下额外检查格式化命令（format C: 等）
+if _IS_WINDOWS:
+    _DANGER_PATTERNS += (('format', '格式化操作，会丢失数据！'),)
 
 
 class CommandExecutor:
     """Shell命令执行器"""
 
+    # 所有片段合并成一个正则，一次扫描完成匹配；每个片段一个分组，用 lastindex 找回警告
+    _DANGER_RE = re.compile(
+        '|'.join(f'({re.escape(needle)})' for needle, _ in _DANGER_PATTERNS),
+        re.IGNORECASE
+    )
+    _DANGER_WARNINGS = tuple(warning for _, warning in _DANGER_PATTERNS)
+
+    # 同时包含 'rm ' 和 '-rf'（顺序不限）
+    _RM_RF_RE = re.compile(r'rm .*-rf|-rf.*rm ', re.IGNORECASE | re.DOTALL)
+
     def __init__(self, config):
         """
         初始化命令执行器
@@ -23,16 +211,30 @@ class CommandExecutor:
             config: 配置对象
         """
         self.config = config
-        self.platform = platform.system()
+        self.platform = _PLATFORM
         self.timeout = config.command_timeout if hasattr(config, 'command_timeout') else 30
-
-    def execute(self, command: str, timeout: Optional[int] = None) -> Dict:
+        self.cache_allowlist = tuple(config.cache_allowlist) if hasattr(config, 'cache_allowlist') else ()
+        self._cache = _CommandCache(
+            config.cache_dir if hasattr(config, 'cache_dir') else DEFAULT_CACHE_DIR,
+            config.cache_ttl if hasattr(config, 'cache_ttl') else 0
+        )
+        self._system_info_cache = None
+
+    def execute(
+        self,
+        command: str,
+        timeout: Optional[int] = None,
+        skip_cache: bool = False,
+        bust_cache: bool = False
+    ) -> Dict:
         """
         执行Shell命令
 
         Args:
-            command: 要执行的Shell命令
+            command: 要执行的Shell命令，可包含 !cache:skip / !cache:bust 指令
             timeout: 超时时间（秒），None则使用默认值
+            skip_cache: 本次不读写缓存，同 !cache:skip
+            bust_cache: 清除缓存后重新执行，同 !cache:bust；命令为空时清空全部缓存
 
         Returns:
             Dict: 执行结果，格式:
@@ -44,122 +246,325 @@ class CommandExecutor:
                       'command': '执行的命令'
                   }
         """
-        if not command or not command.strip():
-            return {
-                'status': 'error',
-                'output': '',
-                'error': '命令不能为空',
-                'return_code': -1,
-                'command': command
-            }
+        command, use_cache, early_result = self._prepare(command, skip_cache, bust_cache)
+        if early_result is not None:
+            return early_result
 
+        return self._run(command, use_cache, timeout)
+
+    def _run(self, command: str, use_cache: bool, timeout: Optional[int]) -> Dict:
+        """一次性执行命令并收集全部输出"""
         # 使用配置的超时时间
         exec_timeout = timeout if timeout is not None else self.timeout
 
         try:
-            # 根据操作系统选择Shell和编码
-            if self.platform == 'Windows':
-                # 检测当前使用的 Shell
-                shell_type = self._get_shell_type()
-                
-                if shell_type == 'PowerShell':
-                    # 使用 PowerShell 执行
-                    shell_cmd = ['powershell.exe', '-Command', command]
-                    use_shell = False
-                else:
-                    # 使用 CMD 执行
-                    shell_cmd = command
-                    use_shell = True
-                
-                # Windows 使用 GBK 编码（中文 Windows 默认编码）
-                encoding = 'gbk'
-            else:
-                shell_cmd = command
-                use_shell = True
-                # Linux/macOS 使用 UTF-8
-                encoding = 'utf-8'
-
-            # 执行命令
-            process = subprocess.Popen(
+            shell_cmd, use_shell, encoding = self._build_shell_command(command)
+
+            # 执行命令并等待完成（超时后 subprocess.run 会结束进程）
+            completed = subprocess.run(
                 shell_cmd,
                 shell=use_shell,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                capture_output=True,
+                bufsize=-1,  # 全缓冲管道（io.DEFAULT_BUFFER_SIZE），减少大输出时的 read 调用
                 text=True,
                 encoding=encoding,
-                errors='replace'  # 遇到无法解码的字符时替换
+                errors='replace',  # 遇到无法解码的字符时替换
+                timeout=exec_timeout
             )
 
-            # 等待命令完成
-            stdout, stderr = process.communicate(timeout=exec_timeout)
-            return_code = process.returncode
-
-            # 判断执行状态
-            if return_code == 0:
-                status = 'success'
-            else:
-                status = 'error'
-
-            return {
-                'status': status,
-                'output': stdout.strip() if stdout else '',
-                'error': stderr.strip() if stderr else '',
-                'return_code': return_code,
-                'command': command
-            }
+            result = self._make_result(command, completed.returncode, completed.stdout, completed.stderr)
+            if use_cache:
+                self._cache.put(command, result)
+
+            return result
 
         except subprocess.TimeoutExpired:
-            process.kill()
-            return {
-                'status': 'error',
-                'output': '',
-                'error': f'命令执行超时（{exec_timeout}秒）',
-                'return_code': -1,
-                'command': command
-            }
+            return self._error_result(command, f'命令执行超时（{exec_timeout}秒）')
 
         except FileNotFoundError as e:
-            return {
-                'status': 'error',
-                'output': '',
-                'error': f'命令未找到: {str(e)}',
-                'return_code': -1,
-                'command': command
-            }
+            return self._error_result(command, f'命令未找到: {str(e)}')
 
         except PermissionError as e:
-            return {
-                'status': 'error',
-                'output': '',
-                'error': f'权限不足: {str(e)}',
-                'return_code': -1,
-                'command': command
-            }
+            return self._error_result(command, f'权限不足: {str(e)}')
 
         except Exception as e:
-            return {
-                'status': 'error',
-                'output': '',
-                'error': f'执行失败: {str(e)}',
-                'return_code': -1,
-                'command': command
-            }
+            return self._error_result(command, f'执行失败: {str(e)}')
+
+    def execute_streaming(
+        self,
+        command: str,
+        on_stdout: Optional[Callable[[str], None]] = None,
+        on_stderr: Optional[Callable[[str], None]] = None,
+        on_done: Optional[Callable[[Dict], None]] = None,
+        timeout: Optional[int] = None,
+        skip_cache: bool = False,
+        bust_cache: bool = False
+    ) -> Dict:
+        """
+        执行Shell命令，并在输出产生时分块回调
+
+        适合输出较多的命令：第一块输出到达即可显示，无需等待命令结束。
+        回调在调用本方法的线程中执行。Windows 的 select 不支持管道，
+        此时退化为一次性执行后回调全部输出。
+
+        Args:
+            command: 要执行的Shell命令
+            on_stdout: 收到标准输出块时的回调
+            on_stderr: 收到错误输出块时的回调
+            on_done: 执行结束时的回调，参数为执行结果
+            timeout: 超时时间（秒），None则使用默认值
+            skip_cache: 本次不读写缓存，同 !cache:skip
+            bust_cache: 清除缓存后重新执行，同 !cache:bust
+
+        Returns:
+            Dict: 执行结果，格式同 execute()
+        """
+        command, use_cache, result = self._prepare(command, skip_cache, bust_cache)
+
+        if result is None:
+            result = self._run_streaming(command, use_cache, timeout, on_stdout, on_stderr)
+        else:
+            self._emit_all(result, on_stdout, on_stderr)
+
+        if on_done:
+            on_done(result)
+        return result
+
+    @staticmethod
+    def _emit_all(result: Dict, on_stdout, on_stderr):
+        """把已完成命令的全部输出一次性交给回调"""
+        if on_stdout and result['output']:
+            on_stdout(result['output'])
+        if on_stderr and result['error']:
+            on_stderr(result['error'])
+
+    def _run_streaming_windows(self, command, use_cache, timeout, on_stdout, on_stderr) -> Dict:
+        """Windows 的 select 不支持管道，执行结束后一次性回调"""
+        result = self._run(command, use_cache, timeout)
+        self._emit_all(result, on_stdout, on_stderr)
+        return result
+
+    def _run_streaming_posix(self, command, use_cache, timeout, on_stdout, on_stderr) -> Dict:
+        """用 selectors 同时读取 stdout/stderr，每次最多读取 64KB"""
+        exec_timeout = timeout if timeout is not None else self.timeout
+        deadline = time.monotonic() + exec_timeout
+
+        try:
+            shell_cmd, use_shell, encoding = self._build_shell_command(command)
+            process = subprocess.Popen(
+                shell_cmd,
+                shell=use_shell,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        except FileNotFoundError as e:
+            return self._error_result(command, f'命令未找到: {str(e)}')
+        except PermissionError as e:
+            return self._error_result(command, f'权限不足: {str(e)}')
+        except Exception as e:
+            return self._error_result(command, f'执行失败: {str(e)}')
+
+        stdout_chunks, stderr_chunks = [], []
+        selector = selectors.DefaultSelector()
+        # 按块增量解码，避免多字节字符被拆开
+        selector.register(process.stdout, selectors.EVENT_READ,
+                          (stdout_chunks, codecs.getincrementaldecoder(encoding)('replace'), on_stdout))
+        selector.register(process.stderr, selectors.EVENT_READ,
+                          (stderr_chunks, codecs.getincrementaldecoder(encoding)('replace'), on_stderr))
+
+        try:
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    process.kill()
+                    return self._error_result(command, f'命令执行超时（{exec_timeout}秒）')
+
+                for key, _ in selector.select(timeout=remaining):
+                    chunks, decoder, callback = key.data
+                    data = key.fileobj.read1(65536)
+                    if data:
+                        text = decoder.decode(data)
+                    else:
+                        selector.unregister(key.fileobj)
+                        text = decoder.decode(b'', final=True)
+                    if text:
+                        chunks.append(text)
+                        if callback:
+                            callback(text)
+
+            try:
+                return_code = process.wait(timeout=max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                return self._error_result(command, f'命令执行超时（{exec_timeout}秒）')
+
+        except Exception as e:
+            process.kill()
+            return self._error_result(command, f'执行失败: {str(e)}')
+
+        finally:
+            selector.close()
+            process.stdout.close()
+            process.stderr.close()
+
+        result = self._make_result(command, return_code, ''.join(stdout_chunks), ''.join(stderr_chunks))
+        if use_cache:
+            self._cache.put(command, result)
+
+        return result
+
+    # 平台在类定义时已确定，直接绑定对应实现，调用时无需再判断
+    _run_streaming = _run_streaming_windows if _IS_WINDOWS else _run_streaming_posix
+
+    def _prepare(self, command: str, skip_cache: bool = False, bust_cache: bool = False) -> Tuple[str, bool, Optional[Dict]]:
+        """
+        执行前的公共处理：解析缓存指令、检查空命令、查询缓存
+
+        Returns:
+            tuple: (去除指令后的命令, 是否使用缓存, 可直接返回的结果或 None)
+        """
+        command, skip_token, bust_token = pop_cache_tokens(command or '', CACHE_SKIP_TOKEN, CACHE_BUST_TOKEN)
+        skip_cache = skip_cache or skip_token
+        bust_cache = bust_cache or bust_token
+
+        if bust_cache:
+            self._cache.bust(command or None)
+            if not command:
+                return command, False, {
+                    'status': 'success',
+                    'output': '命令缓存已清空',
+                    'error': '',
+                    'return_code': 0,
+                    'command': CACHE_BUST_TOKEN
+                }
+
+        if not command:
+            return command, False, self._error_result(command, '命令不能为空')
+
+        fast_result = self._try_fast_path(command)
+        if fast_result is not None:
+            return command, False, fast_result
+
+        use_cache = not skip_cache and self._is_cacheable(command)
+        if use_cache:
+            cached = self._cache.get(command)
+            if cached is not None:
+                return command, True, cached
+
+        return command, use_cache, None
+
+    def _try_fast_path_posix(self, command: str) -> Optional[Dict]:
+        """
+        在当前进程内直接完成 pwd / cd / echo / whoami 等简单命令
+
+        Returns:
+            Optional[Dict]: 执行结果；不适用快速路径时返回 None
+        """
+        if any(ch in _FAST_PATH_UNSAFE_CHARS for ch in command):
+            return None
+
+        try:
+            tokens = shlex.split(command)
+        except ValueError:
+            return None
+
+        handler = _FAST_PATH.get(tokens[0]) if tokens else None
+        if handler is None:
+            return None
+
+        outcome = handler(tokens[1:])
+        if outcome is None:
+            return None
+
+        return_code, stdout, stderr = outcome
+        return self._make_result(command, return_code, stdout, stderr)
+
+    def _try_fast_path_windows(self, command: str) -> Optional[Dict]:
+        """Windows 下 cmd/PowerShell 的语义不同，一律交给 Shell 执行"""
+        return None
+
+    def _build_windows_command(self, command: str) -> Tuple[object, bool, str]:
+        """
+        Windows 下选择 PowerShell 或 CMD 执行
+
+        Returns:
+            tuple: (传给子进程的命令, 是否通过 shell 执行, 输出编码)
+        """
+        # 检测当前使用的 Shell
+        if self._get_shell_type() == 'PowerShell':
+            # 使用 PowerShell 执行
+            shell_cmd = ['powershell.exe', '-Command', command]
+            use_shell = False
+        else:
+            # 使用 CMD 执行
+            shell_cmd = command
+            use_shell = True
+
+        # Windows 使用 GBK 编码（中文 Windows 默认编码）
+        return shell_cmd, use_shell, 'gbk'
+
+    def _build_posix_command(self, command: str) -> Tuple[object, bool, str]:
+        """Linux/macOS 通过默认 Shell 执行，使用 UTF-8"""
+        return command, True, 'utf-8'
+
+    if _IS_WINDOWS:
+        _try_fast_path = _try_fast_path_windows
+        _build_shell_command = _build_windows_command
+    else:
+        _try_fast_path = _try_fast_path_posix
+        _build_shell_command = _build_posix_command
+
+    @staticmethod
+    def _make_result(command: str, return_code: int, stdout: str, stderr: str) -> Dict:
+        """根据进程退出码和输出构造执行结果"""
+        return {
+            'status': 'success' if return_code == 0 else 'error',
+            'output': stdout.strip() if stdout else '',
+            'error': stderr.strip() if stderr else '',
+            'return_code': return_code,
+            'command': command
+        }
+
+    @staticmethod
+    def _error_result(command: str, message: str) -> Dict:
+        """构造执行失败的结果"""
+        return {
+            'status': 'error',
+            'output': '',
+            'error': message,
+            'return_code': -1,
+            'command': command
+        }
+
+    def _is_cacheable(self, command: str) -> bool:
+        """只有开启缓存且属于只读白名单的简单命令才缓存"""
+        if self._cache.ttl <= 0 or not command:
+            return False
+        if any(ch in _CACHE_UNSAFE_CHARS for ch in command):
+            return False
+        return any(command == prefix or command.startswith(prefix + ' ') for prefix in self.cache_allowlist)
 
     def get_system_info(self) -> Dict:
         """
         获取系统信息
 
+        除 current_dir 外的字段在进程内不会变化，首次调用后缓存
+
         Returns:
             Dict: 系统信息字典
         """
-        info = {
-            'platform': self.platform,
-            'version': platform.version(),
-            'current_dir': os.getcwd(),
-            'shell': self._get_shell_type(),
-            'python_version': platform.python_version(),
-            'architecture': platform.machine()
-        }
+        if self._system_info_cache is None:
+            self._system_info_cache = {
+                'platform': self.platform,
+                'version': platform.version(),
+                'current_dir': None,
+                'shell': self._get_shell_type(),
+                'python_version': platform.python_version(),
+                'architecture': platform.machine()
+            }
+
+        info = self._system_info_cache.copy()
+        info['current_dir'] = os.getcwd()
 
         return info
 
@@ -170,23 +575,7 @@ class CommandExecutor:
         Returns:
             str: Shell类型（如 cmd, powershell, bash, zsh等）
         """
-        if self.platform == 'Windows':
-            # Windows上检查是否在PowerShell中
-            if os.environ.get('PSModulePath'):
-                return 'PowerShell'
-            else:
-                return 'cmd'
-        else:
-            # Unix-like系统
-            shell = os.environ.get('SHELL', '')
-            if 'bash' in shell:
-                return 'bash'
-            elif 'zsh' in shell:
-                return 'zsh'
-            elif 'fish' in shell:
-                return 'fish'
-            else:
-                return 'sh'
+        return _SHELL_TYPE
 
     def is_dangerous_command(self, command: str) -> tuple[bool, Optional[str]]:
         """
@@ -198,30 +587,14 @@ class CommandExecutor:
         Returns:
             tuple: (是否危险, 警告信息)
         """
-        dangerous_patterns = {
-            'rm -rf /': '删除根目录，极度危险！',
-            'rm -rf /*': '删除根目录下所有文件，极度危险！',
-            'mkfs': '格式化磁盘，会丢失所有数据！',
-            'dd if=': '直接操作设备，可能损坏系统！',
-            ':(){ :|:& };:': 'Fork炸弹，会导致系统崩溃！',
-            'chmod -R 777': '修改所有文件权限，严重安全隐患！',
-            'chown -R': '修改文件所有者，可能导致权限问题！'
-        }
-
-        command_lower = command.lower().strip()
-
-        for pattern, warning in dangerous_patterns.items():
-            if pattern.lower() in command_lower:
-                return True, warning
+        match = self._DANGER_RE.search(command)
+        if match:
+            return True, self._DANGER_WARNINGS[match.lastindex - 1]
 
         # 检查删除操作
-        if 'rm ' in command_lower and '-rf' in command_lower:
+        if self._RM_RF_RE.search(command):
             return True, '强制递归删除操作，请谨慎！'
 
-        # 检查格式化操作
-        if self.platform == 'Windows' and 'format' in command_lower:
-            return True, '格式化操作，会丢失数据！'
-
         return False, None
 
     def validate_command_syntax(self, command: str) -> tuple[bool, Optional[str]]:
@@ -239,7 +612,8 @@ class CommandExecutor:
 
         # 检查是否包含非法字符
         # 注意: 这是一个简单的检查，可能需要根据实际情况调整
-        if command.count('"') % 2 != 0 or command.count("'") % 2 != 0:
+        # str.count 在 C 层扫描，比逐字符的 Python 循环快得多；两个计数按位或后看最低位
+        if (command.count('"') | command.count("'")) & 1:
             return False, "引号不匹配"
 
         return True, None
@@ -6,8 +6,33 @@
 """
 
 import os
-import json
-from typing import Optional
+from pathlib import Path
+from typing import Optional, Tuple
+
+import json_compat
+
+
+# 命令结果缓存和 LLM 结果缓存的默认目录
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'smart_shell')
+
+
+def pop_cache_tokens(text: str, skip_token: str, bust_token: str) -> Tuple[str, bool, bool]:
+    """
+    从输入中移除缓存控制指令（命令缓存和 LLM 缓存共用）
+
+    Args:
+        text: 用户输入或命令
+        skip_token: 本次不读写缓存的指令
+        bust_token: 清空缓存的指令
+
+    Returns:
+        tuple: (去除指令后的文本, 是否跳过缓存, 是否清空缓存)
+    """
+    skip = skip_token in text
+    bust = bust_token in text
+    if skip or bust:
+        text = text.replace(skip_token, '').replace(bust_token, '')
+    return text.strip(), skip, bust
 
 
 class Config:
@@ -32,14 +57,21 @@ class Config:
         self.model_name = 'qwen-plus'  # 默认模型（通义千问）
         self.temperature = 0.05  # 温度参数，越低越确定
         self.max_tokens = 1000  # 最大token数
+        self.llm_cache_ttl = 0  # LLM 结果缓存有效期（秒），0 表示不缓存
 
         # 命令执行配置
         self.command_timeout = 30  # 命令执行超时时间（秒）
         self.auto_confirm = False  # 是否自动确认执行命令
 
+        # 命令结果缓存配置
+        self.cache_ttl = 0  # 缓存有效期（秒），0 表示不缓存
+        self.cache_allowlist = ['ls', 'echo', 'git status', 'pwd', 'cat']  # 允许缓存的只读命令前缀
+        self.cache_dir = DEFAULT_CACHE_DIR
+
         # 历史记录配置
         self.history_file = 'shell_history.json'
         self.max_history_records = 100  # 最大历史记录数
+        self.fsync_history = False  # 每次写入历史记录都同步到磁盘（更安全，但更慢）
 
         # 安全配置
         self.enable_dangerous_command_check = True  # 是否启用危险命令检查
@@ -56,12 +88,11 @@ class Config:
         """从配置文件加载配置"""
         if os.path.exists(self.config_file):
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config_data = json.load(f)
-                    self._update_from_dict(config_data)
+                config_data = json_compat.loads(Path(self.config_file).read_bytes())
+                self._update_from_dict(config_data)
                 if self.debug:
                     print(f"✅ 已加载配置文件: {self.config_file}")
-            except (json.JSONDecodeError, IOError) as e:
+            except (json_compat.JSONDecodeError, IOError) as e:
                 print(f"⚠️  警告: 无法加载配置文件 {self.config_file}: {e}")
         else:
             if self.debug:
@@ -79,9 +110,13 @@ class Config:
             'model_name': self.model_name,
             'temperature': self.temperature,
             'max_tokens': self.max_tokens,
+            'llm_cache_ttl': self.llm_cache_ttl,
             'command_timeout': self.command_timeout,
             'auto_confirm': self.auto_confirm,
+            'cache_ttl': self.cache_ttl,
+            'cache_allowlist': self.cache_allowlist,
             'max_history_records': self.max_history_records,
+            'fsync_history': self.fsync_history,
             'enable_dangerous_command_check': self.enable_dangerous_command_check,
             'allow_destructive_commands': self.allow_destructive_commands,
             'show_warnings': self.show_warnings,
@@ -90,8 +125,7 @@ class Config:
         }
 
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, ensure_ascii=False, indent=2)
+            Path(self.config_file).write_bytes(json_compat.dumps(config_data, indent=True))
             print(f"✅ 配置已保存到: {self.config_file}")
         except IOError as e:
             print(f"❌ 保存配置失败: {e}")
@@ -125,12 +159,15 @@ class Config:
         print(f"模型名称: {self.model_name}")
         print(f"温度参数: {self.temperature}")
         print(f"最大Token: {self.max_tokens}")
+        print(f"LLM 缓存: {f'{self.llm_cache_ttl}秒' if self.llm_cache_ttl > 0 else '关闭'}")
         print(f"API Base: {self.api_base}")
         print(f"API Key: {'已设置' if self.api_key else '未设置'}")
         print(f"命令超时: {self.command_timeout}秒")
         print(f"自动确认: {self.auto_confirm}")
+        print(f"命令缓存: {f'{self.cache_ttl}秒' if self.cache_ttl > 0 else '关闭'}")
         print(f"历史记录文件: {self.history_file}")
         print(f"最大历史记录数: {self.max_history_records}")
+        print(f"历史记录同步写盘: {self.fsync_history}")
         print(f"危险命令检查: {self.enable_dangerous_command_check}")
         print(f"允许破坏性命令: {self.allow_destructive_commands}")
         print("=" * 60)
@@ -14,60 +14,63 @@ from PyQt6.QtWidgets import (
     QListWidget, QListWidgetItem, QMessageBox, QStatusBar,
     QGroupBox, QCheckBox, QTabWidget
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal, QTimer
 from PyQt6.QtGui import QFont, QTextCursor, QColor, QPalette
 
 # 添加 src 目录到 Python 路径
 sys.path.insert(0, os.path.dirname(__file__))
 
-from command_executor import CommandExecutor
-from llm_interface import LLMInterface
+from command_executor import CACHE_BUST_TOKEN, CACHE_SKIP_TOKEN, CommandExecutor
 from history_manager import HistoryManager
-from config import Config
+from config import Config, pop_cache_tokens
 from safety_checker import SafetyChecker
 from visualizer import CommandVisualizer
 
 
-class CommandWorker(QThread):
-    """后台执行命令的工作线程"""
+class _TaskSignals(QObject):
+    """后台任务的信号（QRunnable 不是 QObject，信号需放在单独的对象上）"""
     finished = pyqtSignal(dict)
     error = pyqtSignal(str)
+    chunk = pyqtSignal(str)  # 流式输出的增量内容
 
-    def __init__(self, executor, command):
-        super().__init__()
-        self.executor = executor
-        self.command = command
 
-    def run(self):
-        try:
-            result = self.executor.execute(self.command)
-            self.finished.emit(result)
-        except Exception as e:
-            self.error.emit(str(e))
+class _Task(QRunnable):
+    """提交到线程池执行的后台任务"""
 
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self.signals = _TaskSignals()
+        self.cancelled = False
+        self._resource = None
 
-class LLMWorker(QThread):
-    """后台调用 LLM 的工作线程"""
-    finished = pyqtSignal(dict)
-    error = pyqtSignal(str)
+    def attach(self, resource):
+        """关联可关闭的资源（如 HTTP 响应），取消任务时一并关闭
 
-    def __init__(self, llm, user_input, context, system_info):
-        super().__init__()
-        self.llm = llm
-        self.user_input = user_input
-        self.context = context
-        self.system_info = system_info
+        Args:
+            resource: 带 close() 方法的对象
+        """
+        self._resource = resource
+        if self.cancelled:
+            resource.close()
+
+    def cancel(self):
+        """取消任务：尚未开始则不再执行，已在执行则丢弃结果并关闭关联的资源"""
+        self.cancelled = True
+        resource = self._resource
+        if resource is not None:
+            resource.close()
 
     def run(self):
+        if self.cancelled:
+            return
         try:
-            result = self.llm.natural_language_to_command(
-                user_input=self.user_input,
-                context=self.context,
-                system_info=self.system_info
-            )
-            self.finished.emit(result)
+            result = self.fn()
+            if not self.cancelled:
+                self.signals.finished.emit(result)
         except Exception as e:
-            self.error.emit(str(e))
+            if not self.cancelled:
+                self.signals.error.emit(str(e))
 
 
 class SmartShellGUI(QMainWindow):
@@ -76,14 +79,27 @@ class SmartShellGUI(QMainWindow):
     def __init__(self):
         super().__init__()
         self.config = Config(debug=False)
-        self.llm = LLMInterface(self.config)
+        # LLM 客户端（及 requests 等依赖）在第一次分析时才加载，缩短启动时间
+        self.llm = None
         self.executor = CommandExecutor(self.config)
         self.history = HistoryManager(self.config)
         self.safety_checker = SafetyChecker()
         
+        self._system_info_text = self._build_system_info_text()
+
         self.current_command = ""
-        self.llm_worker = None
-        self.cmd_worker = None
+        # 输入中的 !cache:skip / !cache:bust 指令，执行命令时生效
+        self.current_cache_flags = (False, False)
+        # 复用线程池执行命令和解析输出，保存信号对象防止被回收
+        self.pool = QThreadPool.globalInstance()
+        self.pool.setMaxThreadCount(4)
+        # LLM 调用使用单独的线程池：已取消的请求在等待响应头期间仍会占用线程，
+        # 不能让它们挤占命令执行和输出解析的线程
+        self.llm_pool = QThreadPool(self)
+        self.llm_signals = None
+        self.cmd_signals = None
+        # 正在进行的 LLM 分析，重新分析时取消
+        self.llm_task = None
         
         self.init_ui()
         self.load_history()
@@ -336,8 +352,19 @@ class SmartShellGUI(QMainWindow):
         """
         self.setStyleSheet(style)
 
+    def get_llm(self):
+        """获取 LLM 接口，首次调用时导入并创建"""
+        if self.llm is None:
+            from llm_interface import LLMInterface
+            self.llm = LLMInterface(self.config)
+        return self.llm
+
     def get_system_info_text(self):
         """获取系统信息文本"""
+        return self._system_info_text
+
+    def _build_system_info_text(self):
+        """生成系统信息文本（启动时生成一次）"""
         info = self.executor.get_system_info()
         return f"系统: {info['platform']} | Shell: {info['shell']} | 工作目录: {info['current_dir']}"
 
@@ -348,23 +375,59 @@ class SmartShellGUI(QMainWindow):
             QMessageBox.warning(self, "警告", "请输入自然语言描述")
             return
         
+        # 命令缓存指令在执行时生效，不交给大模型
+        user_input, skip_cache, bust_cache = pop_cache_tokens(user_input, CACHE_SKIP_TOKEN, CACHE_BUST_TOKEN)
+        if not user_input:
+            # 只输入了 !cache:bust 时清空全部命令缓存
+            if bust_cache:
+                self.status_bar.showMessage(self.executor.execute('', bust_cache=True)['output'])
+            else:
+                QMessageBox.warning(self, "警告", "请输入自然语言描述")
+            return
+        self.current_cache_flags = (skip_cache, bust_cache)
+        
+        try:
+            llm = self.get_llm()
+        except ImportError as e:
+            QMessageBox.critical(self, "错误", f"无法加载 LLM 模块:\n{e}\n\n请先安装依赖: pip install -r requirements.txt")
+            return
+        
+        # 修改输入后重新分析：取消上一次分析，不再等待它的结果；
+        # 排队中尚未开始的分析直接移出线程池
+        if self.llm_task is not None:
+            self.llm_task.cancel()
+        self.llm_pool.clear()
+        
         self.status_bar.showMessage("正在分析...")
-        self.analyze_btn.setEnabled(False)
         self.execute_btn.setEnabled(False)
         
         # 获取历史上下文
         context = self.history.get_recent_context(limit=5)
         system_info = self.executor.get_system_info()
         
-        # 在后台线程中调用 LLM
-        self.llm_worker = LLMWorker(self.llm, user_input, context, system_info)
-        self.llm_worker.finished.connect(self.on_llm_finished)
-        self.llm_worker.error.connect(self.on_llm_error)
-        self.llm_worker.start()
+        # 在线程池中调用 LLM
+        # 收到响应后关联到任务上，取消时关闭响应，不再读取响应体
+        task = _Task(lambda: llm.natural_language_to_command(
+            user_input=user_input,
+            context=context,
+            system_info=system_info,
+            on_response=task.attach
+        ))
+        task.signals.finished.connect(self.on_llm_finished)
+        task.signals.error.connect(self.on_llm_error)
+        self.llm_signals = task.signals
+        self.llm_task = task
+        # 已取消的请求可能仍在等待响应头，按正在运行的数量放宽上限，
+        # 保证本次分析立即开始，不排在被丢弃的请求后面
+        self.llm_pool.setMaxThreadCount(self.llm_pool.activeThreadCount() + 1)
+        self.llm_pool.start(task)
 
     def on_llm_finished(self, result):
         """LLM 分析完成"""
-        self.analyze_btn.setEnabled(True)
+        # 已被新的分析取代（结果在取消前已发出）
+        if self.sender() is not self.llm_signals:
+            return
+        self.llm_task = None
         
         if result.get('error'):
             self.status_bar.showMessage(f"错误: {result['error']}")
@@ -379,13 +442,14 @@ class SmartShellGUI(QMainWindow):
         self.current_command = command
         
         # 安全检查
-        safety_level, safety_desc, safety_color = self.safety_checker.check_safety(command)
-        safety_tips = self.safety_checker.get_safety_tips(command)
+        safety = self.safety_checker.classify(command)
+        safety_level = safety['level']
+        safety_desc = safety['desc']
         
         # 显示命令
         display_text = f"命令: {command}\n"
         display_text += f"\n{safety_desc}\n"
-        display_text += f"提示: {safety_tips}\n"
+        display_text += f"提示: {safety['tip']}\n"
         
         if explanation:
             display_text += f"\n解释: {explanation}\n"
@@ -407,7 +471,9 @@ class SmartShellGUI(QMainWindow):
 
     def on_llm_error(self, error_msg):
         """LLM 调用出错"""
-        self.analyze_btn.setEnabled(True)
+        if self.sender() is not self.llm_signals:
+            return
+        self.llm_task = None
         self.status_bar.showMessage(f"错误: {error_msg}")
         QMessageBox.critical(self, "错误", f"LLM 调用失败:\n{error_msg}")
 
@@ -432,11 +498,21 @@ class SmartShellGUI(QMainWindow):
         self.execute_btn.setEnabled(False)
         self.analyze_btn.setEnabled(False)
         
-        # 在后台线程中执行命令
-        self.cmd_worker = CommandWorker(self.executor, self.current_command)
-        self.cmd_worker.finished.connect(self.on_command_finished)
-        self.cmd_worker.error.connect(self.on_command_error)
-        self.cmd_worker.start()
+        # 在线程池中执行命令，输出边产生边显示
+        self.visualizer.clear()
+        command = self.current_command
+        skip_cache, bust_cache = self.current_cache_flags
+        task = _Task(lambda: self.executor.execute_streaming(
+            command,
+            on_stdout=task.signals.chunk.emit,
+            skip_cache=skip_cache,
+            bust_cache=bust_cache
+        ))
+        task.signals.chunk.connect(self.visualizer.append_output)
+        task.signals.finished.connect(self.on_command_finished)
+        task.signals.error.connect(self.on_command_error)
+        self.cmd_signals = task.signals
+        self.pool.start(task)
 
     def on_command_finished(self, result):
         """命令执行完成"""
@@ -452,16 +528,18 @@ class SmartShellGUI(QMainWindow):
         
         # 使用可视化组件显示结果
         if result['status'] == 'success':
+            # 文本输出已在执行过程中逐块显示，这里只更新文件树和统计
             self.visualizer.visualize_output(
                 self.current_command,
                 result['output'],
-                result['status']
+                result['status'],
+                show_text=False
             )
             self.status_bar.showMessage("命令执行成功")
         else:
             # 错误时显示文本
             error_output = f"执行失败\n\n{result['error']}"
-            self.visualizer.text_output.setPlainText(error_output)
+            self.visualizer.set_text(error_output)
             self.status_bar.showMessage("命令执行失败")
         
         # 刷新历史记录
@@ -477,19 +555,26 @@ class SmartShellGUI(QMainWindow):
 
     def on_clear_clicked(self):
         """清空按钮点击事件"""
+        if self.llm_task is not None:
+            self.llm_task.cancel()
+            self.llm_task = None
+            self.llm_signals = None
+        self.llm_pool.clear()
         self.input_text.clear()
         self.command_display.clear()
         self.command_display.setStyleSheet("")  # 重置样式
         self.visualizer.clear()
         self.current_command = ""
+        self.current_cache_flags = (False, False)
         self.execute_btn.setEnabled(False)
         self.status_bar.showMessage("已清空")
 
     def load_history(self):
         """加载历史记录"""
-        self.history_list.clear()
         records = self.history.get_recent_context(limit=20)
         
+        # 先构建好所有列表项，再一次性插入
+        items = []
         for record in records:
             timestamp = record.get('timestamp', '')
             user_input = record.get('user_input', 'N/A')
@@ -502,7 +587,18 @@ class SmartShellGUI(QMainWindow):
             
             item = QListWidgetItem(item_text)
             item.setData(Qt.ItemDataRole.UserRole, record)
-            self.history_list.addItem(item)
+            items.append(item)
+        
+        # 插入期间暂停重绘和信号，只在最后刷新一次
+        self.history_list.setUpdatesEnabled(False)
+        self.history_list.blockSignals(True)
+        try:
+            self.history_list.clear()
+            for item in items:
+                self.history_list.addItem(item)
+        finally:
+            self.history_list.blockSignals(False)
+            self.history_list.setUpdatesEnabled(True)
 
     def on_history_item_clicked(self, item):
         """历史记录项点击事件"""
@@ -515,11 +611,11 @@ class SmartShellGUI(QMainWindow):
         details += f"状态: {record.get('status', 'N/A')}"
         self.command_display.setPlainText(details)
         
-        # 使用可视化组件显示输出
+        # 使用可视化组件显示输出（较长的输出从单独的文件中读取完整内容）
         if record.get('output'):
             self.visualizer.visualize_output(
                 record.get('command', ''),
-                record.get('output', ''),
+                self.history.get_full_output(record),
                 record.get('status', 'unknown')
             )
 
@@ -561,6 +657,11 @@ class SmartShellGUI(QMainWindow):
         
         self.stats_text.setPlainText(stats_text)
 
+    def closeEvent(self, event):
+        """关闭窗口前等待历史记录全部写入"""
+        self.history.commit_history()
+        super().closeEvent(event)
+
 
 def main():
     """主函数"""
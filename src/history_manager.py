@@ -5,15 +5,75 @@
 负责保存和查询命令执行历史
 """
 
-import json
 import os
+import queue
+import sqlite3
+import threading
+from collections import deque
 from datetime import datetime
+from itertools import count, islice
 from typing import List, Dict, Optional
+import json_compat
+
+
+# 记录字段与数据库列的对应关系（timestamp 保存在 ts 列）
+# output_ref 为完整输出文件的路径，输出较短时为 None
+_RECORD_FIELDS = ('timestamp', 'user_input', 'command', 'status', 'output', 'error', 'return_code', 'output_ref')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history(
+    id INTEGER PRIMARY KEY,
+    ts TEXT,
+    user_input TEXT,
+    command TEXT,
+    status TEXT,
+    output TEXT,
+    error TEXT,
+    return_code INT,
+    output_ref TEXT
+);
+"""
+
+_INSERT_SQL = ("INSERT INTO history(ts, user_input, command, status, output, error, return_code, output_ref) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+# 删除最新 N 条之外的所有记录（按 id 排序，不依赖 id 连续）
+_TRIM_SQL = "DELETE FROM history WHERE id IN (SELECT id FROM history ORDER BY id DESC LIMIT -1 OFFSET ?)"
+_TRIMMED_REFS_SQL = ("SELECT output_ref FROM history WHERE output_ref IS NOT NULL AND id IN "
+                     "(SELECT id FROM history ORDER BY id DESC LIMIT -1 OFFSET ?)")
+
+# 超过 _OUTPUT_INLINE_LIMIT 个字符的输出另存为文件，记录中只保留开头的 _OUTPUT_PREVIEW_LENGTH 个字符
+_OUTPUT_INLINE_LIMIT = 500
+_OUTPUT_PREVIEW_LENGTH = 120
+
+
+def _search_key(record: Dict) -> str:
+    """生成记录的搜索键：小写的用户输入和命令，以空字符分隔"""
+    return f"{record.get('user_input') or ''}\0{record.get('command') or ''}".lower()
+
+
+# 导出文件使用 512KB 写缓冲，减少写入系统调用次数
+_EXPORT_BUFFER_SIZE = 1 << 19
+
+# 写入线程每个事务最多写入的记录数，以及收集一批记录时的最长等待时间（秒）
+_BATCH_SIZE = 16
+_BATCH_WAIT = 0.1
+
+# 写入队列中表示“清空历史”和“停止写入线程”的标记
+_CLEAR = object()
+_STOP = object()
 
 
 class HistoryManager:
     """历史记录管理器"""
 
+    # 属性固定，使用 __slots__ 减少实例字典开销
+    __slots__ = (
+        'config', 'history_file', 'max_records', 'fsync', 'db_file', 'output_dir',
+        '_output_seq', '_conn', '_row_count', 'history', '_success_count', '_search_keys',
+        '_queue', '_writer',
+    )
+
     def __init__(self, config):
         """
         初始化历史记录管理器
@@ -22,9 +82,33 @@ class HistoryManager:
             config: 配置对象
         """
         self.config = config
-        self.history_file = config.history_file if hasattr(config, 'history_file') else 'shell_history.json'
-        self.max_records = config.max_history_records if hasattr(config, 'max_history_records') else 100
-        self.history = self._load_history()
+        # 转为绝对路径：执行 cd 会改变当前进程的工作目录，之后打开的连接不能跟着换目录
+        self.history_file = os.path.abspath(getattr(config, 'history_file', 'shell_history.json'))
+        self.max_records = getattr(config, 'max_history_records', 100)
+        self.fsync = getattr(config, 'fsync_history', False)
+        # 历史记录保存在与 history_file 同名的 SQLite 数据库中，旧的 JSON 文件会在首次启动时导入
+        self.db_file = os.path.splitext(self.history_file)[0] + '.db'
+        # 较长的命令输出保存在数据库旁的 outputs 目录
+        self.output_dir = os.path.join(os.path.dirname(self.db_file), 'outputs')
+        # 文件名中的序号，避免同一时刻的两条记录（Windows 时钟精度较低）使用同一个文件
+        self._output_seq = count()
+        self._conn = self._connect()
+        # 数据库中的记录数，超过 max_records 的两倍时才删除旧记录
+        self._row_count = 0
+        # 最多保留 max_records 条，追加时自动丢弃最旧的记录
+        self.history = deque(self._load_history(), maxlen=self.max_records)
+        # 成功记录数随增删增量维护，统计时无需遍历历史
+        self._success_count = sum(1 for record in self.history if record.get('status') == 'success')
+        # 与 self.history 一一对应的搜索键，搜索时无需再逐条转小写
+        self._search_keys = deque((_search_key(record) for record in self.history), maxlen=self.max_records)
+
+        # 数据库写入交给后台线程，add_record 只需入队，不在交互路径上等待磁盘
+        # 加载完成后连接只由写入线程使用；读取走内存中的 self.history
+        self._queue = queue.Queue()
+        self._writer = None
+        if self._conn is not None:
+            self._writer = threading.Thread(target=self._writer_loop, name='history-writer', daemon=True)
+            self._writer.start()
 
     def add_record(self, user_input: str, command: str, result: Dict):
         """
@@ -35,24 +119,60 @@ class HistoryManager:
             command: 执行的Shell命令
             result: 执行结果字典
         """
+        now = datetime.now()
+        output = result.get('output', '')
+        full_output = None
+        output_ref = None
+        if len(output) > _OUTPUT_INLINE_LIMIT:
+            if self._writer is not None:
+                # 完整输出由写入线程另存为文件，记录中只保留开头部分
+                full_output = output
+                output_ref = os.path.join(self.output_dir, f"{now:%Y%m%d-%H%M%S-%f}-{next(self._output_seq)}.txt")
+                output = output[:_OUTPUT_PREVIEW_LENGTH] + '…'
+            else:
+                output = output[:_OUTPUT_INLINE_LIMIT]  # 限制输出长度
+
         record = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'user_input': user_input,
             'command': command,
             'status': result.get('status', 'unknown'),
-            'output': result.get('output', '')[:500],  # 限制输出长度
+            'output': output,
             'error': result.get('error', ''),
-            'return_code': result.get('return_code', -1)
+            'return_code': result.get('return_code', -1),
+            'output_ref': output_ref
         }
 
+        # 已满时 append 会挤掉最旧的一条，先扣除它的计数
+        if self.history and len(self.history) == self.max_records and self.history[0].get('status') == 'success':
+            self._success_count -= 1
+
         self.history.append(record)
+        self._search_keys.append(_search_key(record))
+        if record['status'] == 'success':
+            self._success_count += 1
+
+        # 交给写入线程保存到数据库（只插入新记录，不重写整个文件）
+        self._enqueue((record, full_output))
 
-        # 限制历史记录数量
-        if len(self.history) > self.max_records:
-            self.history = self.history[-self.max_records:]
+    def get_full_output(self, record: Dict) -> str:
+        """
+        获取记录的完整输出
 
-        # 保存到文件
-        self._save_history()
+        Args:
+            record: 历史记录
+
+        Returns:
+            str: 完整输出；输出文件不存在时返回记录中保存的部分
+        """
+        output_ref = record.get('output_ref')
+        if output_ref:
+            try:
+                with open(output_ref, 'r', encoding='utf-8') as f:
+                    return f.read()
+            except OSError:
+                pass
+        return record.get('output') or ''
 
     def get_recent_context(self, limit: int = 5) -> List[Dict]:
         """
@@ -64,7 +184,10 @@ class HistoryManager:
         Returns:
             List[Dict]: 历史记录列表
         """
-        return self.history[-limit:] if len(self.history) > 0 else []
+        # 从右端取 limit 条再恢复时间顺序，不必遍历整个队列
+        recent = list(islice(reversed(self.history), limit))
+        recent.reverse()
+        return recent
 
     def get_all_history(self) -> List[Dict]:
         """
@@ -73,12 +196,26 @@ class HistoryManager:
         Returns:
             List[Dict]: 所有历史记录
         """
-        return self.history
+        return list(self.history)
 
     def clear_history(self):
         """清空历史记录"""
-        self.history = []
-        self._save_history()
+        self.history.clear()
+        self._search_keys.clear()
+        self._success_count = 0
+        self._enqueue(_CLEAR)
+
+    def commit_history(self):
+        """
+        等待所有待写入的记录保存到数据库，然后停止写入线程
+
+        程序退出前调用；之后新增的记录只保存在内存中。
+        """
+        if self._writer is None:
+            return
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._writer = None
 
     def search_history(self, keyword: str) -> List[Dict]:
         """
@@ -91,14 +228,7 @@ class HistoryManager:
             List[Dict]: 匹配的历史记录
         """
         keyword_lower = keyword.lower()
-        results = []
-
-        for record in self.history:
-            if (keyword_lower in record.get('user_input', '').lower() or
-                keyword_lower in record.get('command', '').lower()):
-                results.append(record)
-
-        return results
+        return [record for record, key in zip(self.history, self._search_keys) if keyword_lower in key]
 
     def get_success_rate(self) -> float:
         """
@@ -110,8 +240,7 @@ class HistoryManager:
         if len(self.history) == 0:
             return 0.0
 
-        success_count = sum(1 for record in self.history if record.get('status') == 'success')
-        return success_count / len(self.history)
+        return self._success_count / len(self.history)
 
     def get_statistics(self) -> Dict:
         """
@@ -128,7 +257,7 @@ class HistoryManager:
                 'success_rate': 0.0
             }
 
-        success_count = sum(1 for record in self.history if record.get('status') == 'success')
+        success_count = self._success_count
         error_count = len(self.history) - success_count
 
         return {
@@ -139,70 +268,269 @@ class HistoryManager:
             'recent_commands': self.get_recent_context(5)
         }
 
+    def _enqueue(self, item):
+        """把写入任务交给写入线程"""
+        if self._writer is not None:
+            self._queue.put(item)
+
+    def _writer_loop(self):
+        """写入线程：把队列中的记录攒成一批，在同一个事务中写入，直到收到停止标记"""
+        while True:
+            batch = [self._queue.get()]
+            # 继续收集随后到达的记录，队列空闲超过 _BATCH_WAIT 秒或收到停止标记时立即写入
+            while len(batch) < _BATCH_SIZE and batch[-1] is not _STOP:
+                try:
+                    batch.append(self._queue.get(timeout=_BATCH_WAIT))
+                except queue.Empty:
+                    break
+
+            stop = self._process_batch(batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                break
+        self._conn.close()
+
+    def _process_batch(self, batch: List) -> bool:
+        """
+        按顺序处理一批写入任务，相邻的记录合并为一次插入
+
+        记录以 (record, full_output) 的形式入队，full_output 为需要另存的完整输出
+
+        Returns:
+            bool: 是否收到停止标记
+        """
+        records = []
+        for item in batch:
+            if item is _STOP or item is _CLEAR:
+                self._save_records(records)
+                records = []
+                if item is _STOP:
+                    return True
+                self._clear_records()
+            else:
+                records.append(item)
+        self._save_records(records)
+        return False
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """
+        打开历史记录数据库
+
+        Returns:
+            Optional[sqlite3.Connection]: 数据库连接，打开失败时为 None（仅保留内存中的记录）
+        """
+        try:
+            # 连接在初始化线程中打开，之后交给写入线程使用
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            # WAL 模式下插入只追加日志，提交是原子的，中途崩溃不会损坏已有记录
+            conn.execute("PRAGMA journal_mode=WAL")
+            # NORMAL 同步级别避免每次提交都 fsync；fsync_history 开启时每次提交都落盘
+            conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+            # 排序、子查询等产生的临时数据放在内存中
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.executescript(_SCHEMA)
+            # 旧版数据库没有 output_ref 列
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(history)")}
+            if 'output_ref' not in columns:
+                conn.execute("ALTER TABLE history ADD COLUMN output_ref TEXT")
+            return conn
+        except sqlite3.Error as e:
+            print(f"警告: 无法打开历史记录数据库: {e}")
+            return None
+
     def _load_history(self) -> List[Dict]:
         """
-        从文件加载历史记录
+        从数据库加载最近的历史记录
 
         Returns:
             List[Dict]: 历史记录列表
         """
-        if not os.path.exists(self.history_file):
+        if self._conn is None:
             return []
 
         try:
-            with open(self.history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-                # 确保不超过最大记录数
-                return history[-self.max_records:] if len(history) > self.max_records else history
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"警告: 无法加载历史记录文件: {e}")
+            self._import_json_history()
+            self._row_count = self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT ts, user_input, command, status, output, error, return_code, output_ref "
+                "FROM history ORDER BY id DESC LIMIT ?",
+                (self.max_records,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"警告: 无法加载历史记录: {e}")
             return []
 
-    def _save_history(self):
-        """保存历史记录到文件"""
+        return [dict(zip(_RECORD_FIELDS, row)) for row in reversed(rows)]
+
+    def _import_json_history(self):
+        """首次使用数据库时，导入旧版 JSON 历史记录文件"""
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] > 0:
+            return
+
+        records = []
+        if os.path.exists(self.history_file):
+            try:
+                with open(self.history_file, 'rb') as f:
+                    records = json_compat.loads(f.read())[-self.max_records:]
+            except (json_compat.JSONDecodeError, IOError) as e:
+                print(f"警告: 无法导入历史记录文件: {e}")
+
+        with self._conn:
+            self._conn.executemany(
+                _INSERT_SQL,
+                [tuple(record.get(field) for field in _RECORD_FIELDS) for record in records]
+            )
+            self._conn.execute("PRAGMA user_version = 1")
+
+    def _save_records(self, items: List):
+        """
+        在一个事务中插入一批历史记录（在写入线程中执行）
+
+        旧记录不在每次插入时删除，而是在记录数超过 max_records 的两倍时一次性压缩，
+        大部分插入只是一次追加。加载时只读取最近的 max_records 条，多出的旧记录不可见。
+
+        Args:
+            items: (record, full_output) 列表
+        """
+        if self._conn is None or not items:
+            return
+
+        records = []
+        for record, full_output in items:
+            if full_output is not None:
+                self._write_output(record, full_output)
+            records.append(record)
+
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f, ensure_ascii=False, indent=2)
-        except IOError as e:
+            with self._conn:
+                self._conn.executemany(
+                    _INSERT_SQL,
+                    [tuple(record[field] for field in _RECORD_FIELDS) for record in records]
+                )
+            self._row_count += len(records)
+            if self._row_count > 2 * self.max_records:
+                self._compact()
+        except sqlite3.Error as e:
             print(f"警告: 无法保存历史记录: {e}")
 
+    def _write_output(self, record: Dict, full_output: str):
+        """把完整输出写入 record['output_ref']，失败时记录只保留部分输出"""
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(record['output_ref'], 'w', encoding='utf-8') as f:
+                f.write(full_output)
+        except OSError as e:
+            print(f"警告: 无法保存命令输出: {e}")
+            record['output_ref'] = None
+
+    def _remove_outputs(self, refs):
+        """删除不再被记录引用的输出文件"""
+        for (output_ref,) in refs:
+            try:
+                os.remove(output_ref)
+            except OSError:
+                pass
+
+    def _clear_records(self):
+        """删除数据库中的所有记录及其输出文件"""
+        try:
+            refs = self._conn.execute("SELECT output_ref FROM history WHERE output_ref IS NOT NULL").fetchall()
+            with self._conn:
+                self._conn.execute("DELETE FROM history")
+            self._row_count = 0
+            self._remove_outputs(refs)
+        except sqlite3.Error as e:
+            print(f"警告: 无法清空历史记录: {e}")
+
+    def _compact(self):
+        """删除最近 max_records 条之前的所有记录及其输出文件"""
+        refs = self._conn.execute(_TRIMMED_REFS_SQL, (self.max_records,)).fetchall()
+        with self._conn:
+            self._conn.execute(_TRIM_SQL, (self.max_records,))
+        self._row_count = self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+        self._remove_outputs(refs)
+
     def export_history(self, output_file: str, format: str = 'json'):
         """
         导出历史记录
 
         Args:
             output_file: 输出文件路径
-            format: 导出格式 ('json', 'txt', 'csv')
+            format: 导出格式 ('json', 'txt', 'csv', 'db')
+                    'db' 直接复制 SQLite 数据库，无需逐条序列化
         """
         try:
+            if format == 'db':
+                self._backup_database(output_file)
+            else:
+                records = self._export_records()
+
             if format == 'json':
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.history, f, ensure_ascii=False, indent=2)
+                # 导出文件供程序读取，使用紧凑格式，不做缩进
+                with open(output_file, 'wb', buffering=_EXPORT_BUFFER_SIZE) as f:
+                    f.write(json_compat.dumps(records))
 
             elif format == 'txt':
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    for i, record in enumerate(self.history, 1):
-                        f.write(f"=== 记录 {i} ===\n")
-                        f.write(f"时间: {record.get('timestamp', 'N/A')}\n")
-                        f.write(f"输入: {record.get('user_input', 'N/A')}\n")
-                        f.write(f"命令: {record.get('command', 'N/A')}\n")
-                        f.write(f"状态: {record.get('status', 'N/A')}\n")
-                        f.write(f"输出: {record.get('output', 'N/A')}\n")
-                        f.write("\n")
+                with open(output_file, 'w', encoding='utf-8', buffering=_EXPORT_BUFFER_SIZE) as f:
+                    for i, record in enumerate(records, 1):
+                        # 每条记录拼成一段文本，只调用一次 write
+                        f.write(
+                            f"=== 记录 {i} ===\n"
+                            f"时间: {record.get('timestamp', 'N/A')}\n"
+                            f"输入: {record.get('user_input', 'N/A')}\n"
+                            f"命令: {record.get('command', 'N/A')}\n"
+                            f"状态: {record.get('status', 'N/A')}\n"
+                            f"输出: {record.get('output', 'N/A')}\n"
+                            "\n"
+                        )
 
             elif format == 'csv':
                 import csv
-                with open(output_file, 'w', encoding='utf-8', newline='') as f:
-                    if len(self.history) > 0:
-                        writer = csv.DictWriter(f, fieldnames=self.history[0].keys())
+                with open(output_file, 'w', encoding='utf-8', newline='', buffering=_EXPORT_BUFFER_SIZE) as f:
+                    if len(records) > 0:
+                        writer = csv.DictWriter(f, fieldnames=records[0].keys())
                         writer.writeheader()
-                        writer.writerows(self.history)
+                        writer.writerows(records)
 
             print(f"历史记录已导出到: {output_file}")
 
-        except IOError as e:
+        except (IOError, sqlite3.Error) as e:
             print(f"导出失败: {e}")
 
+    def _export_records(self) -> List[Dict]:
+        """导出用的记录副本：完整输出直接写在 output 中，不引用输出文件"""
+        # 等待写入线程写完输出文件
+        if self._writer is not None:
+            self._queue.join()
+        return [
+            {**record, 'output': self.get_full_output(record), 'output_ref': None} if record.get('output_ref') else record
+            for record in self.history
+        ]
+
+    def _backup_database(self, output_file: str):
+        """用 SQLite 在线备份复制数据库，只保留最近的 max_records 条"""
+        # 等待写入线程处理完已提交的记录
+        if self._writer is not None:
+            self._queue.join()
+
+        src = sqlite3.connect(self.db_file)
+        dst = sqlite3.connect(output_file)
+        try:
+            src.backup(dst)
+            # 库中可能还有尚未压缩掉的旧记录
+            with dst:
+                dst.execute(_TRIM_SQL, (self.max_records,))
+                # 输出文件之后可能被压缩或清空删除，副本中直接保存完整输出
+                rows = dst.execute("SELECT id, output, output_ref FROM history WHERE output_ref IS NOT NULL").fetchall()
+                dst.executemany(
+                    "UPDATE history SET output = ?, output_ref = NULL WHERE id = ?",
+                    [(self.get_full_output({'output': output, 'output_ref': ref}), row_id) for row_id, output, ref in rows]
+                )
+        finally:
+            dst.close()
+            src.close()
+
 
 def test_history():
     """测试历史记录管理器"""
@@ -235,6 +563,8 @@ def test_history():
         if key != 'recent_commands':
             print(f"  {key}: {value}")
 
+    history.commit_history()
+
 
 if __name__ == '__main__':
     test_history()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON 兼容模块
+优先使用 orjson（C 实现，解析和序列化更快），未安装时退回标准库 json
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，两种实现都可以用它捕获
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """解析 JSON 字符串或 UTF-8 字节串"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """
+    序列化为 UTF-8 字节串（非 ASCII 字符不转义）
+
+    Args:
+        obj: 要序列化的对象
+        indent: 是否以 2 空格缩进输出（供人阅读的文件使用）
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM 结果缓存模块
+缓存自然语言到命令的转换结果，重复的输入无需再次调用大模型
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+
+import json_compat
+from config import DEFAULT_CACHE_DIR
+
+
+# 输入中的缓存控制指令
+LLM_SKIP_TOKEN = '!llm:skip'  # 本次不读写缓存
+LLM_BUST_TOKEN = '!llm:bust'  # 清空缓存
+
+# 归一化规则：合并连续空白，去掉首尾的句末标点
+_WHITESPACE_RE = re.compile(r'\s+')
+_EDGE_PUNCTUATION = ' 。.，,！!？?；;～~'
+
+_SCHEMA = "CREATE TABLE IF NOT EXISTS cache(k BLOB PRIMARY KEY, v BLOB, ts REAL)"
+
+
+class LLMCache:
+    """
+    LLM 结果缓存
+
+    以 (平台, Shell, 当前目录, 归一化后的用户输入) 为键。归一化只忽略大小写、
+    多余空白和首尾标点，例如 "列出文件" 与 "列出文件。" 视为同一输入；
+    命令中有意义的符号（如 "-a"、"*.txt"）保持不变，避免误命中。
+    结果保存在 SQLite 键值表中，一次查询只读取一行。
+    """
+
+    def __init__(self, config):
+        """
+        初始化缓存
+
+        Args:
+            config: 配置对象
+        """
+        self.ttl = config.llm_cache_ttl if hasattr(config, 'llm_cache_ttl') else 0
+        cache_dir = config.cache_dir if hasattr(config, 'cache_dir') else DEFAULT_CACHE_DIR
+        self.cache_file = os.path.join(cache_dir, 'llm_cache.db')
+        # 第一次读写时才打开数据库，未启用缓存时不创建文件
+        self._conn = None
+        # LLM 调用在线程池中执行，多个线程共用一个连接，需要加锁
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, user_input: str, system_info: Optional[Dict]) -> Optional[Dict]:
+        """
+        查找缓存的结果
+
+        Returns:
+            Optional[Dict]: 命中时返回结果字典，否则返回 None
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._connection().execute(
+                    "SELECT v, ts FROM cache WHERE k = ?", (self._key(user_input, system_info),)
+                ).fetchone()
+            except (sqlite3.Error, OSError):
+                # 缓存不可用时直接调用大模型
+                return None
+
+        if row and now - row[1] <= self.ttl:
+            try:
+                return json_compat.loads(row[0])
+            except json_compat.JSONDecodeError:
+                return None
+
+        return None
+
+    def put(self, user_input: str, system_info: Optional[Dict], result: Dict):
+        """保存结果，出错的结果不缓存"""
+        if not self.enabled or result.get('error'):
+            return
+
+        value = json_compat.dumps(result)
+        with self._lock:
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO cache(k, v, ts) VALUES (?, ?, ?)",
+                        (self._key(user_input, system_info), value, time.time())
+                    )
+            except (sqlite3.Error, OSError):
+                pass
+
+    def clear(self):
+        """清空缓存"""
+        if self._conn is None and not os.path.exists(self.cache_file):
+            return
+        with self._lock:
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.execute("DELETE FROM cache")
+            except (sqlite3.Error, OSError):
+                pass
+
+    def _connection(self) -> sqlite3.Connection:
+        """获取数据库连接，首次调用时创建（调用方需持有锁）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            conn = sqlite3.connect(self.cache_file, check_same_thread=False)
+            # WAL 模式下读写互不阻塞，写入只追加日志
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _key(self, user_input: str, system_info: Optional[Dict]) -> bytes:
+        """生成缓存键（16 字节摘要）"""
+        info = system_info or {}
+        normalized = _WHITESPACE_RE.sub(' ', user_input).strip(_EDGE_PUNCTUATION).lower()
+        raw = '\0'.join([
+            str(info.get('platform', '')),
+            str(info.get('shell', '')),
+            str(info.get('current_dir', '')),
+            normalized
+        ])
+        return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).digest()
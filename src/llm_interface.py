@@ -5,9 +5,52 @@ LLM 接口模块
 使用通义千问（Qwen）大模型
 """
 
-from typing import Dict, List, Optional
-import dashscope
+from typing import Callable, Dict, List, Optional
+import functools
 import json
+import re
+import requests
+from requests.adapters import HTTPAdapter
+import json_compat
+from config import pop_cache_tokens
+from llm_cache import LLM_BUST_TOKEN, LLM_SKIP_TOKEN, LLMCache
+
+
+# 通义千问（DashScope）文本生成 REST 接口
+_DASHSCOPE_GENERATION_URL = 'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation'
+_REQUEST_TIMEOUT = 60  # 单次请求超时时间（秒）
+
+# 本身就是命令的简单输入，无需调用大模型（按 Shell 类型区分）
+_DIRECT_COMMANDS = {
+    'PowerShell': frozenset(['get-childitem', 'get-location', 'get-process', 'get-date', 'ls', 'dir', 'pwd']),
+    'cmd': frozenset(['dir', 'ver', 'whoami', 'hostname', 'tasklist']),
+    'posix': frozenset(['ls', 'pwd', 'whoami', 'date', 'df', 'du', 'ps', 'uname', 'hostname']),
+}
+
+# 简单命令后面允许跟的参数：选项（-a、--all、--color=auto）或路径（/tmp、./src、~/x、C:\、/s）
+# 其他单词（如 "ls files larger than 1GB"）说明输入是自然语言，仍交给大模型处理；
+# 参数中不能出现命令分隔、管道、重定向、变量和命令替换等 Shell 元字符
+_DIRECT_ARG_CHAR = r'[^\s;|&<>$`()]'
+_DIRECT_ARG_RE = re.compile(
+    rf'--?\w[\w-]*(?:={_DIRECT_ARG_CHAR}*)?|[.~/\\]{_DIRECT_ARG_CHAR}*'
+    rf'|{_DIRECT_ARG_CHAR}*[/\\]{_DIRECT_ARG_CHAR}*|[A-Za-z]:{_DIRECT_ARG_CHAR}*'
+)
+
+# 危险命令模式（可以扩展），合并成一个正则，一次扫描完成全部检查
+_DANGEROUS_PATTERNS = (
+    r'rm\s+-rf\s+/',      # 删除根目录
+    r'mkfs',              # 格式化磁盘
+    r'dd\s+if=.*of=/dev', # 直接写入设备
+    r':\(\)\{.*\}',       # Fork炸弹
+)
+_DANGEROUS_RE = re.compile('|'.join(_DANGEROUS_PATTERNS))
+
+# 从任意位置开始解析一个 JSON 值，解析到它的结尾即停止
+_JSON_DECODER = json.JSONDecoder()
+
+# 用户提示词中固定不变的部分
+_CONTEXT_HEADER = "历史命令记录（供参考）:\n"
+_PROMPT_FOOTER = "请返回JSON格式的命令。"
 
 
 class LLMInterface:
@@ -21,16 +64,23 @@ class LLMInterface:
             config: 配置对象
         """
         self.config = config
+        # 所有请求复用同一个 HTTP 会话：连接保持打开，后续请求无需重新建立 TLS 连接
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self._session.mount('https://', adapter)
         # 设置通义千问 API Key
-        dashscope.api_key = config.api_key
+        self._session.headers['Authorization'] = f'Bearer {config.api_key}'
         # 设置模型名称（可以在 config 中配置）
         self.model_name = getattr(config, 'model_name', 'qwen-turbo')
+        # 重复输入直接返回缓存结果
+        self.cache = LLMCache(config)
 
     def natural_language_to_command(
         self,
         user_input: str,
         context: List[Dict] = None,
-        system_info: Dict = None
+        system_info: Dict = None,
+        on_response: Optional[Callable[[requests.Response], None]] = None
     ) -> Dict:
         """
         将自然语言转换为Shell命令
@@ -38,7 +88,7 @@ class LLMInterface:
         这是核心接口函数，需要你来实现！
 
         Args:
-            user_input: 用户输入的自然语言描述
+            user_input: 用户输入的自然语言描述，可包含 !llm:skip / !llm:bust 指令
             context: 历史上下文记录列表，每条记录包含:
                      {
                          'user_input': '用户输入',
@@ -53,6 +103,8 @@ class LLMInterface:
                             'current_dir': '当前工作目录',
                             'shell': '当前使用的Shell'
                         }
+            on_response: 收到响应头、读取响应体之前的回调，参数为响应对象；
+                         调用方取消时可关闭该响应，中止读取
 
         Returns:
             Dict: 返回字典格式:
@@ -76,6 +128,27 @@ class LLMInterface:
         TODO: 请实现这个函数！
         """
 
+        user_input, skip_cache, bust_cache = pop_cache_tokens(user_input, LLM_SKIP_TOKEN, LLM_BUST_TOKEN)
+        if bust_cache:
+            self.cache.clear()
+            if not user_input:
+                return {
+                    'command': 'echo "LLM 缓存已清空"',
+                    'explanation': '已清空 LLM 结果缓存',
+                    'warnings': [],
+                    'error': None
+                }
+
+        # 输入本身就是简单命令时直接使用
+        direct = _direct_command(user_input, system_info)
+        if direct is not None:
+            return direct
+
+        if not skip_cache:
+            cached = self.cache.get(user_input, system_info)
+            if cached is not None:
+                return cached
+
         try:
             # 构建系统提示词
             system_prompt = self._build_system_prompt(system_info)
@@ -84,26 +157,37 @@ class LLMInterface:
             user_prompt = self._build_user_prompt(user_input, context)
 
             # 调用通义千问 API
-            response = dashscope.Generation.call(
-                model=self.model_name,
-                messages=[
-                    {'role': 'system', 'content': system_prompt},
-                    {'role': 'user', 'content': user_prompt}
-                ],
-                result_format='message',  # 设置返回格式
-                temperature=0.3,  # 降低随机性，使输出更确定
+            response = self._session.post(
+                _DASHSCOPE_GENERATION_URL,
+                json={
+                    'model': self.model_name,
+                    'input': {
+                        'messages': [
+                            {'role': 'system', 'content': system_prompt},
+                            {'role': 'user', 'content': user_prompt}
+                        ]
+                    },
+                    'parameters': {
+                        'result_format': 'message',  # 设置返回格式
+                        'temperature': 0.3,  # 降低随机性，使输出更确定
+                    }
+                },
+                stream=True,  # 先只读取响应头，调用方取消时可在读取响应体前关闭
+                timeout=_REQUEST_TIMEOUT
             )
+            if on_response is not None:
+                on_response(response)
 
             # 检查响应状态
             if response.status_code == 200:
                 # 提取返回内容
-                result_text = response.output.choices[0].message.content
+                result_text = json_compat.loads(response.content)['output']['choices'][0]['message']['content']
                 
                 # 解析 JSON 响应
                 result = parse_llm_json_response(result_text)
                 
                 # 确保返回格式正确
-                if 'command' not in result:
+                if not isinstance(result.get('command'), str):
                     return {
                         'command': 'echo "LLM 未返回有效命令"',
                         'explanation': '大模型返回格式错误',
@@ -111,18 +195,20 @@ class LLMInterface:
                         'error': 'Invalid response format'
                     }
                 
-                # 添加 error 字段（如果不存在）
-                if 'error' not in result:
-                    result['error'] = None
+                # 补全可选字段（error、warnings 等），模型返回的字段优先
+                result = {'explanation': '', 'warnings': [], 'error': None, **result}
                 
-                # 确保 warnings 字段存在
-                if 'warnings' not in result:
-                    result['warnings'] = []
+                if not skip_cache:
+                    self.cache.put(user_input, system_info, result)
                 
                 return result
             else:
-                # API 调用失败
-                error_msg = f"API 调用失败: {response.code} - {response.message}"
+                # API 调用失败，错误详情在响应体的 code / message 字段中
+                try:
+                    body = json_compat.loads(response.content)
+                except json_compat.JSONDecodeError:
+                    body = {}
+                error_msg = f"API 调用失败: {body.get('code', response.status_code)} - {body.get('message', response.reason)}"
                 return {
                     'command': 'echo "API 调用失败"',
                     'explanation': error_msg,
@@ -150,48 +236,13 @@ class LLMInterface:
         Returns:
             str: 系统提示词
         """
-        platform = system_info.get('platform', 'unknown') if system_info else 'unknown'
-
-        shell_type = system_info.get('shell', 'unknown') if system_info else 'unknown'
-        
-        # 根据 Shell 类型提供不同的示例
-        if shell_type == 'PowerShell':
-            example_cmd = 'Get-ChildItem'
-            example_explanation = '列出当前目录下所有文件和文件夹'
-        elif shell_type == 'cmd':
-            example_cmd = 'dir'
-            example_explanation = '显示当前目录下的文件和文件夹'
-        else:
-            example_cmd = 'ls -la'
-            example_explanation = '列出当前目录下所有文件（包括隐藏文件）的详细信息'
-        
-        prompt = f"""你是一个专业的 Shell 命令助手。你的任务是将用户的自然语言描述转换为准确的Shell命令。
-
-当前系统信息:
-- 操作系统: {platform}
-- Shell: {shell_type}
-- 当前目录: {system_info.get('current_dir', 'unknown') if system_info else 'unknown'}
-
-请遵循以下规则:
-1. 只返回命令本身，不要有多余的解释文字在命令中
-2. 确保命令在 {platform} 系统的 {shell_type} 中可以执行
-3. 如果是 PowerShell，使用 PowerShell 命令（如 Get-ChildItem, Get-Process 等）
-4. 如果是 cmd，使用 CMD 命令（如 dir, tasklist 等）
-5. 如果是 bash/zsh，使用 Unix 命令（如 ls, ps 等）
-6. 如果任务不明确，返回最常用的命令
-7. 如果命令可能有危险（如删除文件），请在 warnings 中说明
-8. 返回格式必须是 JSON:
-   {{
-       "command": "实际的shell命令",
-       "explanation": "命令的中文解释",
-       "warnings": ["警告信息列表（可选）"]
-   }}
-
-示例:
-用户: "显示当前目录下的所有文件"
-返回: {{"command": "{example_cmd}", "explanation": "{example_explanation}", "warnings": []}}
-"""
-        return prompt
+        info = system_info or {}
+        # 系统信息很少变化，相同的 (平台, Shell, 目录) 直接复用已生成的提示词
+        return _build_system_prompt_cached(
+            info.get('platform', 'unknown'),
+            info.get('shell', 'unknown'),
+            info.get('current_dir', 'unknown')
+        )
 
     def _build_user_prompt(self, user_input: str, context: Optional[List[Dict]]) -> str:
         """
@@ -204,25 +255,26 @@ class LLMInterface:
         Returns:
             str: 用户提示词
         """
-        prompt = ""
+        # 各段先放入列表，最后一次拼接
+        parts = []
 
         # 添加历史上下文
-        if context and len(context) > 0:
-            prompt += "历史命令记录（供参考）:\n"
+        if context:
+            parts.append(_CONTEXT_HEADER)
             for i, record in enumerate(context[-3:], 1):  # 只取最近3条
-                prompt += f"{i}. 用户: {record.get('user_input', '')}\n"
-                prompt += f"   命令: {record.get('command', '')}\n"
-                if record.get('status') == 'success':
-                    prompt += f"   结果: 执行成功\n"
-                else:
-                    prompt += f"   结果: 执行失败\n"
-            prompt += "\n"
+                status_text = '执行成功' if record.get('status') == 'success' else '执行失败'
+                parts.append(
+                    f"{i}. 用户: {record.get('user_input', '')}\n"
+                    f"   命令: {record.get('command', '')}\n"
+                    f"   结果: {status_text}\n"
+                )
+            parts.append("\n")
 
         # 添加当前用户输入
-        prompt += f"当前需求: {user_input}\n"
-        prompt += "请返回JSON格式的命令。"
+        parts.append(f"当前需求: {user_input}\n")
+        parts.append(_PROMPT_FOOTER)
 
-        return prompt
+        return "".join(parts)
 
     def explain_command(self, command: str) -> str:
         """
@@ -262,6 +314,93 @@ class LLMInterface:
 
 # ===== 以下是一些辅助函数，帮助你实现大模型调用 =====
 
+@functools.lru_cache(maxsize=16)
+def _build_system_prompt_cached(platform: str, shell_type: str, current_dir: str) -> str:
+    """
+    根据系统信息生成系统提示词（结果按参数缓存）
+
+    Args:
+        platform: 操作系统
+        shell_type: Shell 类型
+        current_dir: 当前目录
+
+    Returns:
+        str: 系统提示词
+    """
+    # 根据 Shell 类型提供不同的示例
+    if shell_type == 'PowerShell':
+        example_cmd = 'Get-ChildItem'
+        example_explanation = '列出当前目录下所有文件和文件夹'
+    elif shell_type == 'cmd':
+        example_cmd = 'dir'
+        example_explanation = '显示当前目录下的文件和文件夹'
+    else:
+        example_cmd = 'ls -la'
+        example_explanation = '列出当前目录下所有文件（包括隐藏文件）的详细信息'
+
+    prompt = f"""你是一个专业的 Shell 命令助手。你的任务是将用户的自然语言描述转换为准确的Shell命令。
+
+当前系统信息:
+- 操作系统: {platform}
+- Shell: {shell_type}
+- 当前目录: {current_dir}
+
+请遵循以下规则:
+1. 只返回命令本身，不要有多余的解释文字在命令中
+2. 确保命令在 {platform} 系统的 {shell_type} 中可以执行
+3. 如果是 PowerShell，使用 PowerShell 命令（如 Get-ChildItem, Get-Process 等）
+4. 如果是 cmd，使用 CMD 命令（如 dir, tasklist 等）
+5. 如果是 bash/zsh，使用 Unix 命令（如 ls, ps 等）
+6. 如果任务不明确，返回最常用的命令
+7. 如果命令可能有危险（如删除文件），请在 warnings 中说明
+8. 返回格式必须是 JSON:
+   {{
+       "command": "实际的shell命令",
+       "explanation": "命令的中文解释",
+       "warnings": ["警告信息列表（可选）"]
+   }}
+
+示例:
+用户: "显示当前目录下的所有文件"
+返回: {{"command": "{example_cmd}", "explanation": "{example_explanation}", "warnings": []}}
+"""
+    return prompt
+
+
+def _direct_command(user_input: str, system_info: Optional[Dict]) -> Optional[Dict]:
+    """
+    判断用户输入是否本身就是一条简单命令（如 "ls"、"pwd -P"、"ls -la /tmp"）
+
+    Args:
+        user_input: 用户输入
+        system_info: 系统信息
+
+    Returns:
+        Optional[Dict]: 是简单命令时返回结果字典，否则返回 None
+    """
+    # 换行等控制字符会让 Shell 把输入当成多条命令
+    if not user_input or not user_input.isascii() or not user_input.isprintable():
+        return None
+
+    shell_type = system_info.get('shell', '') if system_info else ''
+    commands = _DIRECT_COMMANDS.get(shell_type, _DIRECT_COMMANDS['posix'])
+    head, *args = user_input.split()
+    # 只有 PowerShell 和 cmd 的命令不区分大小写
+    if shell_type in ('PowerShell', 'cmd'):
+        head = head.lower()
+    if head not in commands:
+        return None
+    if not all(_DIRECT_ARG_RE.fullmatch(arg) for arg in args):
+        return None
+
+    return {
+        'command': user_input,
+        'explanation': '输入本身就是可执行的命令，已直接使用',
+        'warnings': [],
+        'error': None
+    }
+
+
 def parse_llm_json_response(response_text: str) -> Dict:
     """
     解析大模型返回的JSON格式响应
@@ -272,14 +411,22 @@ def parse_llm_json_response(response_text: str) -> Dict:
     Returns:
         Dict: 解析后的字典
     """
-    import json
-    import re
-
-    # 尝试提取JSON部分
-    json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-    if json_match:
+    # 大多数情况下返回的就是纯 JSON，直接解析
+    try:
+        result = json_compat.loads(response_text.strip())
+        if isinstance(result, dict):
+            return result
+    except json_compat.JSONDecodeError:
+        pass
+
+    # 尝试提取JSON部分（例如包在 ```json 代码块或说明文字中）
+    # 从第一个 '{' 开始解析到与之匹配的 '}'，不用贪婪正则回溯到最后一个 '}'
+    idx = response_text.find('{')
+    if idx != -1:
         try:
-            return json.loads(json_match.group())
+            result, _ = _JSON_DECODER.raw_decode(response_text, idx)
+            if isinstance(result, dict):
+                return result
         except json.JSONDecodeError:
             pass
 
@@ -303,17 +450,4 @@ def validate_command(command: str, platform: str) -> bool:
     Returns:
         bool: 命令是否安全
     """
-    # 危险命令列表（可以扩展）
-    dangerous_patterns = [
-        r'rm\s+-rf\s+/',      # 删除根目录
-        r'mkfs',              # 格式化磁盘
-        r'dd\s+if=.*of=/dev', # 直接写入设备
-        r':\(\)\{.*\}',       # Fork炸弹
-    ]
-
-    import re
-    for pattern in dangerous_patterns:
-        if re.search(pattern, command):
-            return False
-
-    return True
+    return _DANGEROUS_RE.search(command) is None
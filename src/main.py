@@ -5,13 +5,14 @@
 使用大模型将自然语言转换为Shell命令并执行
 """
 
+import os
 import sys
 import argparse
 from typing import Optional
-from command_executor import CommandExecutor
+from command_executor import CACHE_BUST_TOKEN, CACHE_SKIP_TOKEN, CommandExecutor
 from llm_interface import LLMInterface
 from history_manager import HistoryManager
-from config import Config
+from config import Config, pop_cache_tokens
 
 
 class SmartShellAssistant:
@@ -22,6 +23,8 @@ class SmartShellAssistant:
         self.llm = LLMInterface(config)
         self.executor = CommandExecutor(config)
         self.history = HistoryManager(config)
+        # 平台、Shell 等信息在运行期间不变，只有当前目录需要每次获取
+        self._sysinfo_static = {k: v for k, v in self.executor.get_system_info().items() if k != 'current_dir'}
 
     def process_natural_language(self, user_input: str) -> dict:
         """
@@ -40,18 +43,26 @@ class SmartShellAssistant:
         llm_response = self.llm.natural_language_to_command(
             user_input=user_input,
             context=context,
-            system_info=self.executor.get_system_info()
+            system_info={**self._sysinfo_static, 'current_dir': os.getcwd()}
         )
 
         return llm_response
 
-    def execute_command(self, command: str, auto_execute: bool = False) -> dict:
+    def execute_command(
+        self,
+        command: str,
+        auto_execute: bool = False,
+        skip_cache: bool = False,
+        bust_cache: bool = False
+    ) -> dict:
         """
         执行Shell命令
 
         Args:
             command: 要执行的Shell命令
             auto_execute: 是否自动执行（不询问用户）
+            skip_cache: 本次不读写命令缓存（输入中的 !cache:skip）
+            bust_cache: 清除命令缓存后重新执行（输入中的 !cache:bust）
 
         Returns:
             dict: 执行结果
@@ -61,7 +72,7 @@ class SmartShellAssistant:
             if confirm != 'y':
                 return {"status": "cancelled", "message": "用户取消执行"}
 
-        result = self.executor.execute(command)
+        result = self.executor.execute(command, skip_cache=skip_cache, bust_cache=bust_cache)
 
         # 保存到历史记录
         self.history.add_record(
@@ -106,6 +117,14 @@ class SmartShellAssistant:
                     os.system('cls' if sys.platform == 'win32' else 'clear')
                     continue
 
+                # 命令缓存指令在执行时生效，不交给大模型
+                user_input, skip_cache, bust_cache = pop_cache_tokens(user_input, CACHE_SKIP_TOKEN, CACHE_BUST_TOKEN)
+                if not user_input:
+                    # 只输入了 !cache:bust 时清空全部命令缓存
+                    if bust_cache:
+                        print(self.executor.execute('', bust_cache=True)['output'])
+                    continue
+
                 # 处理自然语言输入
                 print(f"\n正在分析: {user_input}")
                 llm_response = self.process_natural_language(user_input)
@@ -126,7 +145,7 @@ class SmartShellAssistant:
                     print(f"警告: {', '.join(warnings)}")
 
                 # 执行命令
-                result = self.execute_command(command, auto_execute=False)
+                result = self.execute_command(command, auto_execute=False, skip_cache=skip_cache, bust_cache=bust_cache)
 
                 if result['status'] == 'success':
                     print(f"\n执行成功:")
@@ -150,6 +169,12 @@ class SmartShellAssistant:
 
     def single_command_mode(self, user_input: str, auto_execute: bool = False):
         """单命令模式"""
+        user_input, skip_cache, bust_cache = pop_cache_tokens(user_input, CACHE_SKIP_TOKEN, CACHE_BUST_TOKEN)
+        if not user_input:
+            if bust_cache:
+                print(self.executor.execute('', bust_cache=True)['output'])
+            return
+
         print(f"正在分析: {user_input}")
         llm_response = self.process_natural_language(user_input)
 
@@ -165,7 +190,7 @@ class SmartShellAssistant:
             print(f"解释: {explanation}")
 
         if auto_execute:
-            result = self.execute_command(command, auto_execute=True)
+            result = self.execute_command(command, auto_execute=True, skip_cache=skip_cache, bust_cache=bust_cache)
             if result['status'] == 'success':
                 print(f"\n执行成功:")
                 print(result['output'])
@@ -225,13 +250,17 @@ def main():
     assistant = SmartShellAssistant(config)
 
     # 根据参数选择模式
-    if args.history:
-        assistant.show_history()
-    elif args.input:
-        user_input = ' '.join(args.input)
-        assistant.single_command_mode(user_input, auto_execute=args.yes)
-    else:
-        assistant.interactive_mode()
+    try:
+        if args.history:
+            assistant.show_history()
+        elif args.input:
+            user_input = ' '.join(args.input)
+            assistant.single_command_mode(user_input, auto_execute=args.yes)
+        else:
+            assistant.interactive_mode()
+    finally:
+        # 退出前等待历史记录全部写入
+        assistant.history.commit_history()
 
 
 if __name__ == '__main__':
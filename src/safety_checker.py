@@ -5,8 +5,23 @@
 评估命令的风险等级
 """
 
-from typing import Tuple
+from typing import Dict, Tuple
+import functools
 import re
+import sys
+
+
+# 风险等级和对应的颜色，驻留后所有结果共用同一个字符串对象，比较时只需比较指针
+_HIGH = sys.intern('high')
+_MEDIUM = sys.intern('medium')
+_LOW = sys.intern('low')
+_RED = sys.intern('#ff0000')
+_ORANGE = sys.intern('#ff9800')
+_GREEN = sys.intern('#4caf50')
+
+# 描述固定的结果直接复用同一个元组
+_SAFE_RESULT = (_LOW, '安全命令', _GREEN)
+_UNKNOWN_RESULT = (_MEDIUM, '未知命令，请谨慎执行', _ORANGE)
 
 
 class SafetyChecker:
@@ -40,26 +55,31 @@ class SafetyChecker:
         (r'sudo\s+', '使用管理员权限'),
     ]
     
-    # 安全命令模式（低风险）
-    SAFE_PATTERNS = [
-        r'^ls\s*',
-        r'^dir\s*',
-        r'^pwd\s*',
-        r'^cd\s+',
-        r'^echo\s+',
-        r'^cat\s+',
-        r'^type\s+',
-        r'^grep\s+',
-        r'^find\s+',
-        r'^ps\s*',
-        r'^top\s*',
-        r'^df\s*',
-        r'^du\s*',
-        r'^whoami\s*',
-        r'^date\s*',
-        r'^Get-',  # PowerShell Get 命令
-        r'^Show-',  # PowerShell Show 命令
-    ]
+    # 安全命令（低风险），只看命令开头，不需要正则：
+    # 以这些前缀开头即为安全命令（如 ls、lsblk、Get-ChildItem，Get-/Show- 为 PowerShell 命令）
+    SAFE_PREFIXES = ('ls', 'dir', 'pwd', 'ps', 'top', 'df', 'du', 'whoami', 'date', 'get-', 'show-')
+    # 这些命令后面带参数时为安全命令（如 cd /tmp、cat file）
+    SAFE_VERBS = frozenset(['cd', 'echo', 'cat', 'type', 'grep', 'find'])
+    
+    # 每一级的模式在类定义时合并成一个正则（忽略大小写），一次扫描完成匹配；
+    # 每个模式一个命名分组，用 lastgroup 找回对应的描述
+    DANGEROUS_RX = re.compile(
+        '|'.join(f'(?P<d{i}>{p})' for i, (p, _) in enumerate(DANGEROUS_PATTERNS)),
+        re.IGNORECASE
+    )
+    DANGEROUS_DESC = [d for _, d in DANGEROUS_PATTERNS]
+    WARNING_RX = re.compile(
+        '|'.join(f'(?P<w{i}>{p})' for i, (p, _) in enumerate(WARNING_PATTERNS)),
+        re.IGNORECASE
+    )
+    WARNING_DESC = [d for _, d in WARNING_PATTERNS]
+    
+    # 各风险等级对应的安全提示
+    _TIPS = {
+        _HIGH: '此命令可能造成严重后果，建议不要执行！',
+        _MEDIUM: '此命令会修改系统状态，请确认后再执行。',
+        _LOW: '此命令是只读操作，可以安全执行。'
+    }
     
     def check_safety(self, command: str) -> Tuple[str, str, str]:
         """
@@ -74,45 +94,30 @@ class SafetyChecker:
                 风险描述: 具体的风险说明
                 颜色代码: '#ff0000' (红), '#ff9800' (橙), '#4caf50' (绿)
         """
-        command = command.strip()
-        
-        # 检查高风险命令
-        for pattern, description in self.DANGEROUS_PATTERNS:
-            if re.search(pattern, command, re.IGNORECASE):
-                return (
-                    'high',
-                    f'高危命令: {description}',
-                    '#ff0000'  # 红色
-                )
-        
-        # 检查中风险命令
-        for pattern, description in self.WARNING_PATTERNS:
-            if re.search(pattern, command, re.IGNORECASE):
-                return (
-                    'medium',
-                    f'需谨慎: {description}',
-                    '#ff9800'  # 橙色
-                )
-        
-        # 检查低风险命令
-        for pattern in self.SAFE_PATTERNS:
-            if re.search(pattern, command, re.IGNORECASE):
-                return (
-                    'low',
-                    '安全命令',
-                    '#4caf50'  # 绿色
-                )
+        # 结果只取决于命令文本，重复检查同一条命令时直接命中缓存
+        return _check(command.strip())
+    
+    def classify(self, command: str) -> Dict[str, str]:
+        """
+        一次得到命令的风险等级、描述、颜色和安全提示
         
-        # 默认为中等风险
-        return (
-            'medium',
-            '未知命令，请谨慎执行',
-            '#ff9800'  # 橙色
-        )
+        Args:
+            command: 要检查的命令
+            
+        Returns:
+            Dict[str, str]: 包含 level、desc、color、tip 四项
+        """
+        level, desc, color = _check(command.strip())
+        return {
+            'level': level,
+            'desc': desc,
+            'color': color,
+            'tip': self._TIPS.get(level, '请谨慎执行此命令。')
+        }
     
     def get_safety_tips(self, command: str) -> str:
         """
-        获取安全提示
+        获取安全提示（只需要提示文本时使用，同时需要等级等信息时请用 classify）
         
         Args:
             command: 命令
@@ -120,15 +125,30 @@ class SafetyChecker:
         Returns:
             str: 安全提示文本
         """
-        level, description, _ = self.check_safety(command)
-        
-        tips = {
-            'high': '此命令可能造成严重后果，建议不要执行！',
-            'medium': '此命令会修改系统状态，请确认后再执行。',
-            'low': '此命令是只读操作，可以安全执行。'
-        }
-        
-        return tips.get(level, '请谨慎执行此命令。')
+        level = _check(command.strip())[0]
+        return self._TIPS.get(level, '请谨慎执行此命令。')
+
+
+@functools.lru_cache(maxsize=1024)
+def _check(command: str) -> Tuple[str, str, str]:
+    """按风险等级依次匹配已去除首尾空白的命令，参见 SafetyChecker.check_safety"""
+    # 检查高风险命令
+    match = SafetyChecker.DANGEROUS_RX.search(command)
+    if match:
+        return (_HIGH, f'高危命令: {SafetyChecker.DANGEROUS_DESC[int(match.lastgroup[1:])]}', _RED)
+    
+    # 检查中风险命令
+    match = SafetyChecker.WARNING_RX.search(command)
+    if match:
+        return (_MEDIUM, f'需谨慎: {SafetyChecker.WARNING_DESC[int(match.lastgroup[1:])]}', _ORANGE)
+    
+    # 检查低风险命令：一次前缀比较加一次集合查找
+    parts = command.split(None, 1)
+    if command.lower().startswith(SafetyChecker.SAFE_PREFIXES) or (len(parts) == 2 and parts[0].lower() in SafetyChecker.SAFE_VERBS):
+        return _SAFE_RESULT
+    
+    # 默认为中等风险
+    return _UNKNOWN_RESULT
 
 
 # 测试代码
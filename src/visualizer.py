@@ -10,12 +10,200 @@ from PyQt6.QtWidgets import (
     QProgressBar, QTextEdit, QGroupBox, QTreeWidget,
     QTreeWidgetItem, QTabWidget
 )
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QFont
+from PyQt6.QtCore import Qt, QTimer, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QFont, QTextCursor
+from typing import Dict, List, Tuple
 import re
 import os
 
 
+# 统计信息一次扫描完成："N 个文件" 汇总行和 "N 字节" 大小（<DIR> 是固定字符串，直接用 str.count 统计）
+_STATS_RX = re.compile(r'(?P<files>\d[\d,]*)\s+个文件|(?P<size>\d[\d,]+)\s+字节')
+# dir /s 在每个目录后都有一行 "N 个文件 M 字节"，最后在这一行之后给出总计
+_DIR_GRAND_TOTAL = '所列文件总数'
+# dir 输出中文件行末尾的 "大小 文件名"
+_DIR_SIZE_RX = re.compile(r'(\d[\d,]*)\s+(\S+)$')
+# dir 输出中不是文件条目的标题行
+_DIR_HEADER_PREFIXES = ('驱动器', '目录')
+# 文本输出最多显示的字符数，超出部分截断，避免超大输出拖慢排版
+_MAX_DISPLAY_CHARS = 200_000
+# 文本框文档的行数上限（超出时 Qt 会从开头删除旧行，对 setPlainText 同样生效）
+_MAX_TEXT_BLOCKS = 5000
+# 按命令中的关键字判断输出类型，只匹配完整的单词
+_FILE_COMMAND_RX = re.compile(r'\b(?:dir|ls|get-childitem|tree|find)\b')
+_PROCESS_COMMAND_RX = re.compile(r'\b(?:ps|tasklist|get-process|top)\b')
+# 文件大小单位，相邻单位相差 1024 倍
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+# 文件树最多显示的行数（与文本输出的行数上限一致）
+_MAX_TREE_ROWS = _MAX_TEXT_BLOCKS
+
+
+def _parse_output(command: str, output: str) -> Tuple[list, list, dict]:
+    """
+    解析命令输出（不访问任何控件，可在后台线程中调用）
+    
+    Args:
+        command: 执行的命令
+        output: 命令输出
+        
+    Returns:
+        tuple: (文件树表头, 文件树各行内容, 统计标签文本)
+    """
+    # 根据命令类型选择可视化方式
+    command_lower = command.lower().strip()
+    # 只拆分一次，各个解析函数共用
+    lines = output.strip().split('\n')
+    
+    if _FILE_COMMAND_RX.search(command_lower):
+        headers, rows = ["名称", "类型", "大小"], _parse_file_list(lines)
+    elif _PROCESS_COMMAND_RX.search(command_lower):
+        headers, rows = ["进程名", "PID", "内存"], _parse_process_list(lines)
+    else:
+        headers, rows = ["内容", "类型", "值"], _parse_generic(lines)
+    
+    return headers, rows, _collect_statistics(output, lines)
+
+
+def _parse_file_list(lines: List[str]) -> List[List[str]]:
+    """解析文件列表"""
+    rows = []
+    
+    # 解析 dir 命令输出 (Windows)
+    for line in lines[:_MAX_TREE_ROWS]:
+        line = line.strip()
+        if not line or line.startswith(_DIR_HEADER_PREFIXES):
+            continue
+        
+        # 尝试解析文件信息
+        parts = line.split()
+        if len(parts) >= 4:
+            try:
+                # Windows dir 格式: 日期 时间 <DIR>/大小 文件名
+                if '<DIR>' in line:
+                    file_type = "目录"
+                    size = "-"
+                    name = ' '.join(parts[3:])
+                else:
+                    file_type = "文件"
+                    # 尝试提取大小
+                    size_match = _DIR_SIZE_RX.search(line)
+                    if size_match:
+                        size = size_match.group(1)
+                        name = size_match.group(2)
+                    else:
+                        size = parts[2] if len(parts) > 2 else "-"
+                        name = parts[-1]
+                
+                rows.append([name, file_type, size])
+            except:
+                pass
+    
+    # 如果没有解析到内容，显示原始输出
+    if not rows:
+        rows.append(["原始输出", "文本", "-"])
+    
+    return rows
+
+
+def _parse_process_list(lines: List[str]) -> List[List[str]]:
+    """解析进程列表"""
+    rows = []
+    
+    for line in lines[1:_MAX_TREE_ROWS + 1]:  # 跳过标题行
+        parts = line.split()
+        if len(parts) >= 2:
+            name = parts[0]
+            pid = parts[1]
+            mem = parts[4] if len(parts) > 4 else "-"
+            rows.append([name, pid, mem])
+    
+    return rows
+
+
+def _parse_generic(lines: List[str]) -> List[List[str]]:
+    """通用解析：最多显示50行"""
+    return [[line[:100], "文本", f"第{i}行"] for i, line in enumerate(lines[:50], 1)]
+
+
+def _collect_statistics(output: str, lines: List[str]) -> Dict[str, str]:
+    """统计行数、文件数、目录数和总大小，返回各统计标签的文本"""
+    # 统计文件数、目录数和总大小
+    file_count = 0
+    dir_count = output.count('<DIR>')
+    total_size = None
+    # 有总计时只统计总计，否则各目录的汇总行会被重复计算
+    grand_total = output.rfind(_DIR_GRAND_TOTAL)
+    summary = output[grand_total:] if grand_total >= 0 else output
+    for match in _STATS_RX.finditer(summary):
+        if match.lastgroup == 'files':
+            file_count += int(match['files'].replace(',', ''))
+        else:
+            total_size = (total_size or 0) + int(match['size'].replace(',', ''))
+    
+    return {
+        'total_lines': str(len(lines)),
+        'total_files': str(file_count),
+        'total_dirs': str(dir_count),
+        'total_size': _format_size(total_size) if total_size is not None else "-",
+        # 执行时间（这里简化处理）
+        'execution_time': "< 1s",
+    }
+
+
+def _format_size(size_bytes: int) -> str:
+    """格式化文件大小"""
+    # 每 10 个二进制位升一级单位，一次除法得到结果
+    index = min(max(size_bytes.bit_length() - 1, 0) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (index * 10)):.2f} {_SIZE_UNITS[index]}"
+
+
+def _truncate_for_display(text: str) -> str:
+    """
+    截取文本开头部分，使字符数和行数都不超过文本框的上限
+    
+    行数超过文档上限时 Qt 会删掉开头的行，所以这里先按行截断，
+    并在末尾（占一行）说明保留了多少内容
+    """
+    total_lines = text.count('\n') + 1
+    if len(text) <= _MAX_DISPLAY_CHARS and total_lines <= _MAX_TEXT_BLOCKS:
+        return text
+    
+    kept = text[:_MAX_DISPLAY_CHARS]
+    # 留一行给截断说明
+    max_lines = _MAX_TEXT_BLOCKS - 1
+    parts = kept.split('\n', max_lines)
+    if len(parts) > max_lines:
+        kept = '\n'.join(parts[:max_lines])
+    kept_lines = min(len(parts), max_lines)
+    return f"{kept}\n{_truncation_marker(kept_lines, len(kept), total_lines, len(text))}"
+
+
+def _truncation_marker(kept_lines: int, kept_chars: int, total_lines: int, total_chars: int) -> str:
+    """截断说明（占一行），整段显示和流式显示共用"""
+    return (
+        f"... (输出过长，已截断：显示前 {kept_lines} 行、{kept_chars} 个字符，"
+        f"共 {total_lines} 行、{total_chars} 个字符)"
+    )
+
+
+class _ParseSignals(QObject):
+    """解析任务的信号（QRunnable 不是 QObject，信号需放在单独的对象上）"""
+    finished = pyqtSignal(list, list, dict)  # 表头, 各行内容, 统计标签文本
+
+
+class _ParseJob(QRunnable):
+    """在线程池中解析命令输出"""
+    
+    def __init__(self, command: str, output: str):
+        super().__init__()
+        self.command = command
+        self.output = output
+        self.signals = _ParseSignals()
+    
+    def run(self):
+        self.signals.finished.emit(*_parse_output(self.command, self.output))
+
+
 class CommandVisualizer(QWidget):
     """命令执行可视化组件"""
     
@@ -45,6 +233,9 @@ class CommandVisualizer(QWidget):
         self.stats_tab = QWidget()
         self.init_stats_tab()
         self.tab_widget.addTab(self.stats_tab, "统计信息")
+        
+        # 文件树和统计信息只在切换到对应标签页时才解析
+        self.tab_widget.currentChanged.connect(self._on_tab_changed)
     
     def init_text_tab(self):
         """初始化文本输出标签页"""
@@ -53,7 +244,24 @@ class CommandVisualizer(QWidget):
         self.text_output = QTextEdit()
         self.text_output.setReadOnly(True)
         self.text_output.setFont(QFont("Consolas", 9))
+        # 限制文档行数，避免超大输出占用过多内存
+        self.text_output.document().setMaximumBlockCount(_MAX_TEXT_BLOCKS)
         layout.addWidget(self.text_output)
+        
+        # 当前等待中的后台解析任务的信号对象，用于丢弃过期的结果
+        self._parse_signals = None
+        # 尚未解析的 (命令, 输出)，停留在文本输出标签页时推迟解析
+        self._pending_parse = None
+        
+        # 流式输出先缓存，定时合并写入，避免每块输出都触发一次排版
+        self._pending_chunks = []
+        # 流式输出同样受字符数和行数上限约束：已显示的和收到的全部字符数、换行数
+        self._shown_chars = self._shown_newlines = 0
+        self._stream_chars = self._stream_newlines = 0
+        self._stream_truncated = False
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self._flush_output)
     
     def init_tree_tab(self):
         """初始化文件树标签页"""
@@ -66,6 +274,8 @@ class CommandVisualizer(QWidget):
         self.file_tree = QTreeWidget()
         self.file_tree.setHeaderLabels(["名称", "类型", "大小"])
         self.file_tree.setColumnWidth(0, 300)
+        # 每行都是单行文本，行高相同，Qt 不必逐行计算高度
+        self.file_tree.setUniformRowHeights(True)
         layout.addWidget(self.file_tree)
     
     def init_stats_tab(self):
@@ -100,7 +310,7 @@ class CommandVisualizer(QWidget):
         layout.addWidget(stats_group)
         layout.addStretch()
     
-    def visualize_output(self, command: str, output: str, status: str):
+    def visualize_output(self, command: str, output: str, status: str, show_text: bool = True):
         """
         可视化命令输出
         
@@ -108,140 +318,138 @@ class CommandVisualizer(QWidget):
             command: 执行的命令
             output: 命令输出
             status: 执行状态
+            show_text: 是否刷新文本输出（已通过 append_output 流式显示时传 False）
         """
         # 显示文本输出
-        self.text_output.setPlainText(output)
-        
-        # 根据命令类型选择可视化方式
-        command_lower = command.lower().strip()
-        
-        if self._is_file_list_command(command_lower):
-            self._visualize_file_list(output)
-        elif self._is_process_command(command_lower):
-            self._visualize_process_list(output)
+        if show_text:
+            self.set_text(output)
         else:
-            self._visualize_generic(output)
+            self._flush_output()
         
-        # 更新统计信息
-        self._update_statistics(output)
+        # 文件树和统计信息不可见时先不解析，切换过去时再解析
+        self._pending_parse = (command, output)
+        self._parse_signals = None
+        if self.tab_widget.currentWidget() is not self.text_tab:
+            self._start_parse()
     
-    def _is_file_list_command(self, command: str) -> bool:
-        """判断是否是文件列表命令"""
-        file_commands = ['dir', 'ls', 'get-childitem', 'tree', 'find']
-        return any(cmd in command for cmd in file_commands)
+    def _on_tab_changed(self, index: int):
+        """切换到文件树或统计信息标签页时解析推迟的输出"""
+        if self.tab_widget.widget(index) is not self.text_tab:
+            self._start_parse()
     
-    def _is_process_command(self, command: str) -> bool:
-        """判断是否是进程命令"""
-        process_commands = ['ps', 'tasklist', 'get-process', 'top']
-        return any(cmd in command for cmd in process_commands)
-    
-    def _visualize_file_list(self, output: str):
-        """可视化文件列表"""
-        self.file_tree.clear()
+    def _start_parse(self):
+        """解析推迟的输出"""
+        if self._pending_parse is None:
+            return
+        command, output = self._pending_parse
+        self._pending_parse = None
         
-        lines = output.strip().split('\n')
-        
-        # 解析 dir 命令输出 (Windows)
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith('驱动器') or line.startswith('目录'):
-                continue
-            
-            # 尝试解析文件信息
-            parts = line.split()
-            if len(parts) >= 4:
-                try:
-                    # Windows dir 格式: 日期 时间 <DIR>/大小 文件名
-                    if '<DIR>' in line:
-                        file_type = "目录"
-                        size = "-"
-                        name = ' '.join(parts[3:])
-                    else:
-                        file_type = "文件"
-                        # 尝试提取大小
-                        size_match = re.search(r'(\d[\d,]*)\s+(\S+)$', line)
-                        if size_match:
-                            size = size_match.group(1)
-                            name = size_match.group(2)
-                        else:
-                            size = parts[2] if len(parts) > 2 else "-"
-                            name = parts[-1]
-                    
-                    item = QTreeWidgetItem([name, file_type, size])
-                    self.file_tree.addTopLevelItem(item)
-                except:
-                    pass
-        
-        # 如果没有解析到内容，显示原始输出
-        if self.file_tree.topLevelItemCount() == 0:
-            item = QTreeWidgetItem(["原始输出", "文本", "-"])
-            self.file_tree.addTopLevelItem(item)
+        # 解析输出（正则扫描、逐行拆分）在线程池中进行，避免大输出卡住界面；
+        # 解析结果通过信号回到界面线程再更新控件
+        job = _ParseJob(command, output)
+        job.signals.finished.connect(self._apply_parsed)
+        self._parse_signals = job.signals
+        QThreadPool.globalInstance().start(job)
     
-    def _visualize_process_list(self, output: str):
-        """可视化进程列表"""
-        self.file_tree.clear()
-        self.file_tree.setHeaderLabels(["进程名", "PID", "内存"])
-        
-        lines = output.strip().split('\n')
-        
-        for line in lines[1:]:  # 跳过标题行
-            parts = line.split()
-            if len(parts) >= 2:
-                try:
-                    name = parts[0]
-                    pid = parts[1] if len(parts) > 1 else "-"
-                    mem = parts[4] if len(parts) > 4 else "-"
-                    
-                    item = QTreeWidgetItem([name, pid, mem])
-                    self.file_tree.addTopLevelItem(item)
-                except:
-                    pass
-    
-    def _visualize_generic(self, output: str):
-        """通用可视化"""
-        self.file_tree.clear()
-        self.file_tree.setHeaderLabels(["内容", "类型", "值"])
-        
-        lines = output.strip().split('\n')
-        for i, line in enumerate(lines[:50], 1):  # 最多显示50行
-            item = QTreeWidgetItem([line[:100], "文本", f"第{i}行"])
-            self.file_tree.addTopLevelItem(item)
-    
-    def _update_statistics(self, output: str):
-        """更新统计信息"""
-        lines = output.strip().split('\n')
-        
-        # 统计行数
-        self.stats_labels['total_lines'].setText(str(len(lines)))
-        
-        # 统计文件和目录数
-        file_count = len(re.findall(r'<DIR>', output))
-        dir_count = len(re.findall(r'<DIR>', output))
+    def append_output(self, chunk: str):
+        """在文本输出末尾追加一段内容（用于流式显示），30ms 内的内容合并写入"""
+        self._pending_chunks.append(chunk)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start(30)
+    
+    def _flush_output(self):
+        """
+        把缓存的输出一次性追加到文本框
         
-        self.stats_labels['total_files'].setText(str(file_count))
-        self.stats_labels['total_dirs'].setText(str(dir_count))
+        超出字符数或行数上限后不再追加，末尾显示与 set_text 相同的截断说明，
+        之后只更新说明中的总行数和总字符数
+        """
+        if not self._pending_chunks:
+            return
+        text = ''.join(self._pending_chunks)
+        self._pending_chunks.clear()
+        newlines = text.count('\n')
+        self._stream_chars += len(text)
+        self._stream_newlines += newlines
         
-        # 统计总大小
-        size_matches = re.findall(r'(\d[\d,]+)\s+字节', output)
-        if size_matches:
-            total_size = sum(int(s.replace(',', '')) for s in size_matches)
-            self.stats_labels['total_size'].setText(self._format_size(total_size))
+        cursor = self.text_output.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        if self._stream_truncated:
+            # 截断说明是最后一行，整行替换
+            cursor.movePosition(QTextCursor.MoveOperation.StartOfBlock, QTextCursor.MoveMode.KeepAnchor)
+        elif self._stream_chars <= _MAX_DISPLAY_CHARS and self._stream_newlines < _MAX_TEXT_BLOCKS:
+            cursor.insertText(text)
+            self._shown_chars += len(text)
+            self._shown_newlines += newlines
+            return
         else:
-            self.stats_labels['total_size'].setText("-")
+            # 与 _truncate_for_display 相同的截取方式：先按字符数，再按行数（留一行给截断说明）
+            kept = text[:_MAX_DISPLAY_CHARS - self._shown_chars]
+            max_newlines = _MAX_TEXT_BLOCKS - 2 - self._shown_newlines
+            if max_newlines < 0:
+                # 已显示的内容正好占满行数上限：删掉最后一行（连同它前面的换行）给截断说明腾出位置
+                cursor.movePosition(QTextCursor.MoveOperation.StartOfBlock, QTextCursor.MoveMode.KeepAnchor)
+                cursor.movePosition(QTextCursor.MoveOperation.PreviousCharacter, QTextCursor.MoveMode.KeepAnchor)
+                self._shown_chars -= len(cursor.selectedText())
+                self._shown_newlines -= 1
+                cursor.removeSelectedText()
+                kept = ''
+            parts = kept.split('\n', max_newlines + 1)
+            if len(parts) > max_newlines + 1:
+                kept = '\n'.join(parts[:max_newlines + 1])
+            self._shown_chars += len(kept)
+            self._shown_newlines += kept.count('\n')
+            self._stream_truncated = True
+            cursor.insertText(kept + '\n')
+        cursor.insertText(_truncation_marker(
+            self._shown_newlines + 1, self._shown_chars,
+            self._stream_newlines + 1, self._stream_chars
+        ))
+    
+    def _apply_parsed(self, headers: list, rows: list, stats: dict):
+        """在界面线程中把后台解析的结果写入文件树和统计信息"""
+        # 丢弃已被新的输出或清空操作取代的解析结果
+        if self.sender() is not self._parse_signals:
+            return
+        self._parse_signals = None
         
-        # 执行时间（这里简化处理）
-        self.stats_labels['execution_time'].setText("< 1s")
+        self.file_tree.setHeaderLabels(headers)
+        self._fill_tree([QTreeWidgetItem(row) for row in rows])
+        for key, text in stats.items():
+            self.stats_labels[key].setText(text)
+    
+    def _fill_tree(self, items):
+        """用给定条目替换文件树内容，插入期间暂停重绘、信号和排序，只在最后刷新一次"""
+        sorting = self.file_tree.isSortingEnabled()
+        self.file_tree.setSortingEnabled(False)
+        self.file_tree.setUpdatesEnabled(False)
+        self.file_tree.blockSignals(True)
+        try:
+            self.file_tree.clear()
+            self.file_tree.addTopLevelItems(items)
+        finally:
+            self.file_tree.blockSignals(False)
+            self.file_tree.setUpdatesEnabled(True)
+            self.file_tree.setSortingEnabled(sorting)
+    
+    def set_text(self, text: str):
+        """替换文本输出的全部内容，过长的内容只显示开头部分"""
+        self._discard_pending_output()
+        self.text_output.setPlainText(_truncate_for_display(text))
     
-    def _format_size(self, size_bytes: int) -> str:
-        """格式化文件大小"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size_bytes < 1024.0:
-                return f"{size_bytes:.2f} {unit}"
-            size_bytes /= 1024.0
-        return f"{size_bytes:.2f} TB"
+    def _discard_pending_output(self):
+        """丢弃尚未写入的流式输出，重新开始计数"""
+        self._flush_timer.stop()
+        self._pending_chunks.clear()
+        self._shown_chars = self._shown_newlines = 0
+        self._stream_chars = self._stream_newlines = 0
+        self._stream_truncated = False
     
     def clear(self):
         """清空显示"""
+        self._discard_pending_output()
+        self._parse_signals = None
+        self._pending_parse = None
         self.text_output.clear()
         self.file_tree.clear()
         for label in self.stats_labels.values():
@@ -169,6 +169,241 @@ def test_llm_interface():
         return False
 
 
+def test_direct_command():
+    """测试简单命令直通（不调用大模型）"""
+    print("\n" + "=" * 60)
+    print("测试 5: 简单命令直通")
+    print("=" * 60)
+    try:
+        from llm_interface import _direct_command
+
+        system_info = {'platform': 'Linux', 'shell': 'bash'}
+        # 本身就是命令：直接使用，不调用大模型
+        direct_inputs = ['ls', 'ls -la', 'ls -la /tmp', 'pwd -P', 'ls --color=auto ./src']
+        # 命令词后面跟着自然语言：必须交给大模型
+        prose_inputs = [
+            'ls files larger than 1GB',
+            'ps show me python processes',
+            'date of tomorrow',
+            'ls | grep py',
+            # 参数中带 Shell 元字符：可能串接其他命令，不能直接执行
+            'ls /;rm -rf ~',
+            'ls /tmp>/etc/x',
+            'ls ./$(whoami)',
+            'ls /tmp\n/bin/rm -rf ~',
+            # POSIX Shell 的命令区分大小写
+            'LS',
+            'PS',
+        ]
+
+        passed = True
+        for text in direct_inputs:
+            result = _direct_command(text, system_info)
+            ok = result is not None and result['command'] == text
+            print(f"  {'✅' if ok else '❌'} 直通: {text}")
+            passed = passed and ok
+        for text in prose_inputs:
+            ok = _direct_command(text, system_info) is None
+            print(f"  {'✅' if ok else '❌'} 交给大模型: {text!r}")
+            passed = passed and ok
+        # cmd 的命令不区分大小写
+        ok = _direct_command('DIR /s', {'platform': 'Windows', 'shell': 'cmd'}) is not None
+        print(f"  {'✅' if ok else '❌'} 直通 (cmd): DIR /s")
+        passed = passed and ok
+
+        if passed:
+            print("✅ 简单命令直通测试通过")
+        else:
+            print("❌ 简单命令直通判断错误")
+        return passed
+
+    except Exception as e:
+        print(f"❌ 简单命令直通测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_history_export_after_cd():
+    """测试执行 cd 之后导出历史记录数据库"""
+    print("\n" + "=" * 60)
+    print("测试 6: cd 之后导出历史记录")
+    print("=" * 60)
+    import sqlite3
+    import tempfile
+    original_dir = os.getcwd()
+    try:
+        from config import Config
+        from command_executor import CommandExecutor
+        from history_manager import HistoryManager
+
+        # 在临时目录中使用相对路径的历史文件，不影响项目目录下的历史记录
+        work_dir = tempfile.mkdtemp()
+        os.chdir(work_dir)
+        os.makedirs('sub')
+
+        config = Config()
+        config.history_file = 'shell_history.json'
+        history = HistoryManager(config)
+        executor = CommandExecutor(config)
+
+        history.add_record(
+            user_input="显示当前目录",
+            command="ls",
+            result={'status': 'success', 'output': 'test output', 'error': '', 'return_code': 0}
+        )
+        executor.execute('cd sub')
+
+        export_file = os.path.join(work_dir, 'export.db')
+        history.export_history(export_file, format='db')
+        history.commit_history()
+
+        conn = sqlite3.connect(export_file)
+        try:
+            rows = conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+        finally:
+            conn.close()
+        stray = os.path.exists(os.path.join(work_dir, 'sub', 'shell_history.db'))
+        print(f"  导出记录数: {rows}")
+        print(f"  新目录中误建的数据库: {stray}")
+
+        if rows == 1 and not stray:
+            print("✅ cd 之后导出历史记录测试通过")
+            return True
+        else:
+            print("❌ cd 之后导出的不是原来的历史记录数据库")
+            return False
+
+    except Exception as e:
+        print(f"❌ cd 之后导出历史记录测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        os.chdir(original_dir)
+
+
+def test_history_full_output():
+    """测试长输出另存为文件后的重新加载和导出"""
+    print("\n" + "=" * 60)
+    print("测试 7: 长输出的保存、加载与导出")
+    print("=" * 60)
+    import json
+    import sqlite3
+    import tempfile
+    try:
+        from config import Config
+        from history_manager import HistoryManager
+
+        work_dir = tempfile.mkdtemp()
+        config = Config()
+        config.history_file = os.path.join(work_dir, 'shell_history.json')
+        long_output = '\n'.join(f"line {i}" for i in range(1000))
+
+        history = HistoryManager(config)
+        history.add_record(
+            user_input="列出大量文件",
+            command="ls -R /",
+            result={'status': 'success', 'output': long_output, 'error': '', 'return_code': 0}
+        )
+        history.commit_history()
+
+        # 重新加载后仍能取回完整输出
+        reloaded = HistoryManager(config)
+        record = reloaded.get_all_history()[-1]
+        reloaded_ok = reloaded.get_full_output(record) == long_output and len(record['output']) < len(long_output)
+        print(f"  重新加载后取回完整输出: {reloaded_ok}")
+
+        json_file = os.path.join(work_dir, 'export.json')
+        db_file = os.path.join(work_dir, 'export.db')
+        reloaded.export_history(json_file, format='json')
+        reloaded.export_history(db_file, format='db')
+        # 清空后输出文件被删除，导出的数据库不能再依赖它
+        reloaded.clear_history()
+        reloaded.commit_history()
+
+        with open(json_file, 'r', encoding='utf-8') as f:
+            json_ok = json.load(f)[-1]['output'] == long_output
+        conn = sqlite3.connect(db_file)
+        try:
+            output, output_ref = conn.execute("SELECT output, output_ref FROM history").fetchone()
+        finally:
+            conn.close()
+        db_ok = output == long_output and output_ref is None
+        print(f"  JSON 导出包含完整输出: {json_ok}")
+        print(f"  数据库导出包含完整输出: {db_ok}")
+
+        if reloaded_ok and json_ok and db_ok:
+            print("✅ 长输出保存与导出测试通过")
+            return True
+        else:
+            print("❌ 长输出未能完整保存或导出")
+            return False
+
+    except Exception as e:
+        print(f"❌ 长输出保存与导出测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_command_cache():
+    """测试命令结果缓存及 !cache:skip / !cache:bust 指令"""
+    print("\n" + "=" * 60)
+    print("测试 8: 命令结果缓存")
+    print("=" * 60)
+    import platform
+    import tempfile
+    try:
+        from config import Config
+        from command_executor import CommandExecutor
+
+        work_dir = tempfile.mkdtemp()
+        config = Config()
+        config.cache_dir = os.path.join(work_dir, 'cache')
+        config.cache_ttl = 60
+        reader = 'type' if platform.system() == 'Windows' else 'cat'
+        config.cache_allowlist = [reader]
+        executor = CommandExecutor(config)
+
+        data_file = os.path.join(work_dir, 'data.txt')
+        command = f"{reader} {data_file}"
+
+        def write(text):
+            with open(data_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+
+        def output(**kwargs):
+            return executor.execute(command, **kwargs)['output'].strip()
+
+        write('first')
+        output()
+        write('second')
+        cached_ok = output() == 'first'
+        skip_ok = output(skip_cache=True) == 'second' and executor.execute(f"!cache:skip {command}")['output'].strip() == 'second'
+        print(f"  命中缓存: {cached_ok}")
+        print(f"  跳过缓存: {skip_ok}")
+
+        bust_ok = output(bust_cache=True) == 'second'
+        write('third')
+        # 清除后重新执行的结果再次写入缓存
+        bust_ok = bust_ok and output() == 'second' and executor.execute(f"{command} !cache:bust")['output'].strip() == 'third'
+        print(f"  清除缓存: {bust_ok}")
+
+        if cached_ok and skip_ok and bust_ok:
+            print("✅ 命令结果缓存测试通过")
+            return True
+        else:
+            print("❌ 命令结果缓存行为不正确")
+            return False
+
+    except Exception as e:
+        print(f"❌ 命令结果缓存测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 def main():
     """主测试函数"""
     print("\n" + "=" * 60)
@@ -183,6 +418,10 @@ def main():
     results.append(("命令执行模块", test_command_executor()))
     results.append(("历史记录模块", test_history_manager()))
     results.append(("LLM 接口模块", test_llm_interface()))
+    results.append(("简单命令直通", test_direct_command()))
+    results.append(("cd 之后导出历史", test_history_export_after_cd()))
+    results.append(("长输出保存与导出", test_history_full_output()))
+    results.append(("命令结果缓存", test_command_cache()))
 
     # 总结
     print("\n" + "=" * 60)